@@ -1,12 +1,79 @@
 import asyncio
+import os
 import numpy as np
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict
+from typing import List, Dict, Optional, Set, Tuple
 import random
 import json
 import time
 import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, BrokenExecutor
+
+from relic_shared.relic_cache import compile_script, RelicError
+
+from tick_codec import TickEncoder, TickFrames
+
+# --- Relic Execution Pool ---
+# Relics run in worker processes so a slow or looping script can't freeze the
+# tick or the WebSocket traffic, and so a hung one can actually be killed.
+# Each tick sends one batch per worker (a slice of the nodes) rather than one
+# job per node.
+RELIC_WORKERS = int(os.getenv("RELIC_WORKERS", "0")) or os.cpu_count() or 1
+TICK_DEADLINE = float(os.getenv("TICK_DEADLINE", "0.08"))  # seconds per tick for all relics
+RELIC_TIMEOUT = float(os.getenv("RELIC_TIMEOUT", "1.0"))  # a batch still running after this is killed
+
+relic_executor = ProcessPoolExecutor(max_workers=RELIC_WORKERS)
+
+def stop_relic_executor(executor: ProcessPoolExecutor):
+    """
+    Shuts the pool down without waiting and kills its workers, even one stuck in a loop.
+    Batches still in flight fail with BrokenProcessPool; callers drop them.
+    """
+    kill_workers = getattr(executor, "kill_workers", None) # Python 3.14+, shuts the pool down too
+    if kill_workers is not None:
+        kill_workers()
+        return
+    # shutdown() forgets the worker processes, so take them first
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.kill()
+
+def reset_relic_executor():
+    """Replaces the pool with a fresh one and forgets the batches that were running."""
+    global relic_executor
+    old, relic_executor = relic_executor, ProcessPoolExecutor(max_workers=RELIC_WORKERS)
+    stop_relic_executor(old)
+    running_relics.clear()
+
+def run_relic_batch(code_str: str, vectors: np.ndarray, neighbor_vectors: np.ndarray):
+    """
+    Runs the injected script for a batch of nodes inside one worker.
+    vectors is (m, 3) and neighbor_vectors (m, k, 3). Returns ((m, 3) results, (m,) ok mask);
+    a row is not ok when its script failed or returned nothing usable.
+    Takes the source (not the compiled function) so it can cross into the process pool;
+    relic_cache makes this a hash lookup after the first batch in each worker.
+    """
+    out = np.zeros(vectors.shape)
+    ok = np.zeros(len(vectors), dtype=bool)
+    try:
+        func = compile_script(code_str)
+    except RelicError:
+        return out, ok
+    for i in range(len(vectors)):
+        try:
+            calc_result = func(vectors[i], list(neighbor_vectors[i]), np)
+            if calc_result is None:
+                continue
+            calc_result = np.array(calc_result, dtype=float)
+            # Anything but one full row (e.g. a scalar that would broadcast) keeps the previous row
+            if calc_result.shape == vectors[i].shape:
+                out[i], ok[i] = calc_result, True
+        except Exception:
+            pass
+    return out, ok
 
 app = FastAPI(title="S3Protocol Relic Node")
 
@@ -51,69 +118,27 @@ class SystemState:
 system = SystemState()
 
 class NodePersona:
-    def __init__(self, id: int, name: str):
-        self.id = id
-        self.name = name
-        # Personality Matrix (-1 to 1)
-        self.matrix = np.random.rand(3, 3) * 2 - 1
-        # Vector State (initially random)
-        self.current_vector = np.random.rand(3)
-        self.drift = random.uniform(0.01, 0.05)
-        self.peers = [] # List of peer IDs
-
-    def run_code(self, neighbor_vectors: List[np.ndarray], code_str: str, mode: str):
-        """
-        Dynamically executes code injected from Frontend.
-        """
-        # 1. Prepare Sandbox Context
-        local_scope = {
-            "vector": self.current_vector,
-            "neighbors": neighbor_vectors,
-            "np": np,
-            "result": None
-        }
-
-        # 2. Execute Injected Logic
-        try:
-            exec(code_str, {}, local_scope)
-
-            # Retrieve result (or fallback to current if script failed to set result)
-            calc_result = local_scope.get("result")
-            if calc_result is None:
-                calc_result = self.current_vector
-
-            # Ensure shape consistency
-            calc_result = np.array(calc_result, dtype=float)
-            if calc_result.shape != (3,):
-                 calc_result = self.current_vector # Fallback on shape mismatch
-
-        except Exception:
-            # On math error, stagnate
-            calc_result = self.current_vector
-
-        # 3. Apply Mode Logic
-        if mode == "COMPUTE":
-            # Pure Research Mode: Accept math result directly
-            self.current_vector = calc_result
-        else:
-            # Persona Mode: Math is an 'opinion' filtered through personality
-            # The calculation is the "Input Logic", the Matrix is the "Bias"
-
-            # Blend calculated result with Matrix distortion
-            distortion = np.dot(calc_result, self.matrix)
-
-            # Apply drift noise
-            noise = np.random.normal(0, self.drift, 3)
-
-            # Update: 80% Retention, 20% New distorted logic
-            self.current_vector = (self.current_vector * 0.8) + (distortion * 0.2) + noise
-
-        # Normalize to prevent explosion (unless doing pure unchecked compute)
-        if mode == "PERSONA":
-            norm = np.linalg.norm(self.current_vector)
-            if norm > 5: self.current_vector = (self.current_vector / norm) * 5
-
-        return self.current_vector
+    """
+    View of one node's row in the Mesh (used by the per-node relic path and speak()).
+    """
+    def __init__(self, mesh: "Mesh", row: int):
+        self.mesh = mesh
+        self.row = row
+
+    @property
+    def id(self): return int(self.mesh.ids[self.row])
+    @property
+    def name(self): return self.mesh.names[self.row]
+    @property
+    def matrix(self): return self.mesh.matrices[self.row]
+    @property
+    def current_vector(self): return self.mesh.vectors[self.row]
+    @property
+    def drift(self): return float(self.mesh.drift[self.row])
+    @property
+    def peers(self): return self.mesh.peers[self.row].tolist() # List of peer IDs
+    @property
+    def late(self): return bool(self.mesh.late[self.row]) # Missed the last tick deadline
 
     def speak(self):
         intensity = np.linalg.norm(self.current_vector)
@@ -127,116 +152,402 @@ class NodePersona:
         if det > 0: return f"✅ {self.name}: Logic integrated."
         return f"🛑 {self.name}: Deviating from consensus."
 
+class Mesh:
+    """
+    Struct-of-arrays store for every node: row i of each array is one node.
+    SPAWN / PURGE are queued and applied at the start of the next tick, so the
+    arrays never change shape while a tick is in flight.
+    """
+    def __init__(self, names: List[str]):
+        self.ids = np.empty(0, dtype=int)
+        self.names: List[str] = []
+        self.matrices = np.empty((0, 3, 3)) # Personality Matrix (-1 to 1)
+        self.vectors = np.empty((0, 3))     # Vector State
+        self.drift = np.empty(0)
+        self.peers = np.empty((0, 0), dtype=int) # (N, k) peer IDs
+        self.late = np.empty(0, dtype=bool)
+        self.pending = []
+        self._next_id = 0 # above every id ever spawned, live or still queued
+        for i, name in enumerate(names):
+            self.spawn(i, name)
+        self.apply_pending()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def next_id(self) -> int:
+        """
+        A fresh node id: never reused, even for purged nodes or spawns still in the queue.
+        """
+        id = self._next_id
+        self._next_id += 1
+        return id
+
+    def spawn(self, id: int, name: str):
+        self._next_id = max(self._next_id, id + 1)
+        self.pending.append(("spawn", id, name))
+
+    def purge(self, id: int):
+        self.pending.append(("purge", id, None))
+
+    def apply_pending(self):
+        for op, id, name in self.pending:
+            if op == "spawn":
+                self.ids = np.append(self.ids, id)
+                self.names.append(name)
+                self.matrices = np.concatenate([self.matrices, (np.random.rand(3, 3) * 2 - 1)[None]])
+                self.vectors = np.concatenate([self.vectors, np.random.rand(1, 3)]) # initially random
+                self.drift = np.append(self.drift, random.uniform(0.01, 0.05))
+            else:
+                keep = self.ids != id
+                self.ids, self.matrices = self.ids[keep], self.matrices[keep]
+                self.vectors, self.drift = self.vectors[keep], self.drift[keep]
+                self.names = [n for n, k in zip(self.names, keep) if k]
+        if self.pending or len(self.late) != len(self.ids):
+            self.peers = np.empty((len(self.ids), 0), dtype=int)
+            self.late = np.zeros(len(self.ids), dtype=bool)
+        self.pending = []
+
+    def node(self, row: int) -> NodePersona:
+        return NodePersona(self, row)
+
+    def apply_results(self, calc: np.ndarray, rows: np.ndarray, mode: str):
+        """
+        Applies the injected code's results (one row per node) to the selected rows in one batched step.
+        """
+        calc = calc[rows]
+
+        # Apply Mode Logic
+        if mode == "COMPUTE":
+            # Pure Research Mode: Accept math result directly
+            self.vectors[rows] = calc
+            return
+
+        # Persona Mode: Math is an 'opinion' filtered through personality
+        # The calculation is the "Input Logic", the Matrix is the "Bias"
+
+        # Blend calculated result with Matrix distortion (calc @ matrix per node)
+        distortion = np.matmul(calc[:, None, :], self.matrices[rows])[:, 0]
+
+        # Apply drift noise
+        noise = np.random.normal(0, 1, calc.shape) * self.drift[rows, None]
+
+        # Update: 80% Retention, 20% New distorted logic
+        vectors = (self.vectors[rows] * 0.8) + (distortion * 0.2) + noise
+
+        # Normalize to prevent explosion (unless doing pure unchecked compute)
+        norm = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.multiply(vectors, 5 / norm, out=vectors, where=norm > 5)
+        self.vectors[rows] = vectors
+
+def sample_peers(n: int, k: int) -> np.ndarray:
+    """
+    (n, k) row indices: k distinct random peers per node, never the node itself.
+    """
+    if k <= 0:
+        return np.empty((n, 0), dtype=int)
+    out = np.empty((n, k), dtype=int)
+    rows = np.arange(n)
+    while len(rows):
+        r = np.random.randint(0, n - 1, size=(len(rows), k))
+        r += r >= rows[:, None] # skip self
+        out[rows] = r
+        s = np.sort(r, axis=1)
+        rows = rows[(s[:, 1:] == s[:, :-1]).any(axis=1)] # resample rows with duplicates
+    return out
+
+def diffusion(vectors: np.ndarray, neighbors: np.ndarray, D: float = 0.1) -> np.ndarray:
+    """
+    DEFAULT_ALGO for every node at once (neighbors are (N, k) row indices).
+    """
+    if neighbors.shape[1] == 0:
+        # No neighbors, strict conservation
+        return vectors.copy()
+    mean_field = vectors[neighbors].mean(axis=1)
+    return vectors + D * (mean_field - vectors)
+
 # Initial Nodes
 names = ["Cynic", "Optimist", "Architect", "Oracle", "Soldier", "Poet", "Merchant", "Thief", "Judge", "Healer", "Jester", "Ghost"]
-nodes = [NodePersona(i, n) for i, n in enumerate(names)]
+mesh = Mesh(names)
+
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5.0"))  # a client stuck longer than this is evicted
+EVENT_QUEUE_SIZE = 32
+
+class ClientChannel:
+    """
+    One viewer's outgoing side. Ticks go into a single latest-frame-wins slot,
+    SYS_EVENTs into a small bounded queue; a dedicated task drains both, so a slow
+    client only ever falls behind itself.
+    """
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.manager = manager
+        self.binary = False     # asked for binary TICK frames (tick_codec)
+        self.sent_seq = None    # seq of the last binary frame sent; a delta needs sent_seq + 1
+        self.events = deque(maxlen=EVENT_QUEUE_SIZE)
+        self.tick = None        # latest (text, frames) not yet sent
+        self.dropped = 0
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+
+    def push_event(self, message: str):
+        self.events.append(message)
+        self.wakeup.set()
+
+    def push_tick(self, text: Optional[str], frames: Optional[TickFrames]):
+        if self.tick is not None:
+            self.dropped += 1
+        self.tick = (text, frames)
+        self.wakeup.set()
+
+    async def send(self):
+        while self.events:
+            await self.websocket.send_text(self.events.popleft())
+        if self.tick is None:
+            return
+        text, frames = self.tick
+        self.tick = None
+        if not self.binary:
+            if text is not None:
+                await self.websocket.send_text(text)
+        elif frames is not None:
+            # Any skipped frame breaks the delta chain, so resync with a keyframe
+            if frames.delta is not None and self.sent_seq == frames.seq - 1:
+                await self.websocket.send_bytes(frames.delta)
+            else:
+                await self.websocket.send_bytes(frames.keyframe)
+            self.sent_seq = frames.seq
+
+    async def run(self):
+        try:
+            while True:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                await asyncio.wait_for(self.send(), timeout=SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Dead or hopelessly slow socket: evict it
+            self.manager.disconnect(self.websocket)
+            try:
+                await self.websocket.close()
+            except Exception:
+                pass
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.channels: Dict[WebSocket, ClientChannel] = {}
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.channels)
+    @property
+    def binary_clients(self):
+        return [c for c in self.channels.values() if c.binary]
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.channels[websocket] = ClientChannel(websocket, self)
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        channel = self.channels.pop(websocket, None)
+        if channel is not None and channel.task is not asyncio.current_task():
+            channel.task.cancel()
+    def set_encoding(self, websocket: WebSocket, encoding: str):
+        channel = self.channels.get(websocket)
+        if channel is not None:
+            channel.binary = encoding == "binary"
+            channel.sent_seq = None
+    def broadcast(self, message: str):
+        """Queues a message for every client; never waits on a socket."""
+        for channel in list(self.channels.values()):
+            channel.push_event(message)
+    def broadcast_tick(self, json_payload, frames: Optional[TickFrames]):
+        """JSON clients get json_payload() (built once, only if needed); binary clients get keyframe/delta."""
+        channels = list(self.channels.values())
+        text = json_payload() if any(not c.binary for c in channels) else None
+        for channel in channels:
+            channel.push_tick(text, frames)
 
 manager = ConnectionManager()
+# Peers are resampled every tick but only drawn as edges; binary clients get them once per PEER_INTERVAL ticks
+PEER_INTERVAL = int(os.getenv("TICK_PEER_INTERVAL", "10"))
+tick_encoder = TickEncoder(peer_interval=PEER_INTERVAL)
+
+# Relic batches that missed their tick deadline and are still running:
+# (future, node ids in the batch, loop time it was submitted)
+running_relics: List[Tuple[asyncio.Future, Set[int], float]] = []
+
+def _consume(fut: asyncio.Future):
+    # Late / killed batches are never awaited; retrieve the outcome so asyncio doesn't warn
+    if not fut.cancelled():
+        fut.exception()
 
 # --- Simulation Loop (10Hz) ---
 async def universe_tick():
+    loop = asyncio.get_running_loop()
+    next_tick = loop.time()
     while True:
-        updates = []
         gossips = []
+        mesh.apply_pending()
+        n = len(mesh)
 
         # 1. Update Topology (Dynamic Mesh for Diffusion)
         # In a real grid, neighbors are static. Here we simulate a shifting p2p mesh.
-        # Each node gets 2 random neighbors per tick.
-
-        node_map = {n.id: n for n in nodes}
-
-        snapshot_vectors = {n.id: n.current_vector.copy() for n in nodes}
-
-        for node in nodes:
-            # Assign Neighbors (Topology)
-            potential_peers = [n for n in nodes if n.id != node.id]
-            # Use fixed seed based on time to stabilize topology slightly for diffusion to look nice
-            # Or fully random for chaos. Let's do fully random for now.
-            peers = random.sample(potential_peers, k=min(len(potential_peers), 3))
-            node.peers = [p.id for p in peers]
-
-            neighbor_vectors = [snapshot_vectors[pid] for pid in node.peers]
-
-            # 2. RUN INJECTED CODE
-            vec = node.run_code(neighbor_vectors, system.code_snippet, system.mode)
-
-            # Generate Gossip
-            if random.random() < 0.02:
-                gossips.append({
-                    "id": str(time.time()),
-                    "node": node.name,
-                    "msg": node.speak(),
-                    "time": time.strftime("%H:%M:%S")
-                })
-
-            updates.append({
-                "id": node.id,
-                "name": node.name,
-                "vector": vec.tolist(),
-                "drift": node.drift,
-                "peers": node.peers
+        # Each node gets 3 random neighbors per tick.
+        neighbors = sample_peers(n, min(n - 1, 3))
+        mesh.peers = mesh.ids[neighbors]
+
+        snapshot_vectors = mesh.vectors.copy()
+        late = np.zeros(n, dtype=bool)
+
+        # 2. RUN INJECTED CODE
+        if system.code_snippet.strip() == DEFAULT_ALGO.strip():
+            # Built-in diffusion: one batched step for the whole mesh
+            calc = diffusion(snapshot_vectors, neighbors)
+        else:
+            # Custom relic: one batch per worker (nodes still busy from an earlier tick are skipped).
+            # Failed scripts fall back to the current vector (stagnate).
+            calc = snapshot_vectors.copy()
+            now = loop.time()
+            # Results that arrive after their deadline are dropped; the nodes rejoin on the next tick
+            running_relics[:] = [r for r in running_relics if not r[0].done()]
+            if any(now - started > RELIC_TIMEOUT for _, _, started in running_relics):
+                # A script is hung: kill the workers instead of letting it pin the pool
+                reset_relic_executor()
+            busy = set().union(*(ids for _, ids, _ in running_relics))
+            late = np.isin(mesh.ids, list(busy))
+
+            executor = relic_executor
+            rows = np.flatnonzero(~late)
+            batches = [b for b in np.array_split(rows, min(RELIC_WORKERS, len(rows)) or 1) if len(b)]
+            futures = []
+            for batch in batches:
+                fut = loop.run_in_executor(
+                    executor, run_relic_batch, system.code_snippet,
+                    snapshot_vectors[batch], snapshot_vectors[neighbors[batch]]
+                )
+                fut.add_done_callback(_consume)
+                futures.append((batch, fut))
+
+            if futures:
+                await asyncio.wait([fut for _, fut in futures], timeout=TICK_DEADLINE)
+
+            broken = False
+            for batch, fut in futures:
+                if not fut.done():
+                    # Missed the deadline: keep the previous vectors and flag the nodes
+                    late[batch] = True
+                    running_relics.append((fut, set(mesh.ids[batch].tolist()), now))
+                elif not fut.cancelled() and fut.exception() is None:
+                    result, ok = fut.result()
+                    calc[batch[ok]] = result[ok]
+                elif not fut.cancelled() and isinstance(fut.exception(), BrokenExecutor):
+                    # A worker died (e.g. the script crashed the process): the pool is unusable
+                    broken = True
+            if broken and executor is relic_executor:
+                reset_relic_executor()
+
+        mesh.late = late
+        mesh.apply_results(calc, ~late, system.mode)
+
+        # Generate Gossip
+        for row in np.flatnonzero(np.random.random(n) < 0.02):
+            node = mesh.node(row)
+            gossips.append({
+                "id": str(time.time()),
+                "node": node.name,
+                "msg": node.speak(),
+                "time": time.strftime("%H:%M:%S")
             })
 
         # 3. Broadcast
-        payload = json.dumps({
-            "type": "TICK",
-            "mode": system.mode,
-            "nodes": updates,
-            "gossip": gossips
-        })
-        try:
-            await manager.broadcast(payload)
-        except:
-            pass
+        def json_payload():
+            return json.dumps({
+                "type": "TICK",
+                "mode": system.mode,
+                "nodes": [{
+                    "id": id,
+                    "name": name,
+                    "vector": vec,
+                    "drift": drift,
+                    "peers": peers,
+                    "late": is_late
+                } for id, name, vec, drift, peers, is_late in zip(
+                    mesh.ids.tolist(), mesh.names, mesh.vectors.tolist(),
+                    mesh.drift.tolist(), mesh.peers.tolist(), mesh.late.tolist()
+                )],
+                "gossip": gossips
+            })
+
+        # Binary frames are only encoded while someone is listening for them
+        frames = None if not manager.binary_clients else tick_encoder.encode(
+            system.mode, mesh.ids.tolist(), mesh.names, mesh.drift.tolist(),
+            mesh.vectors, mesh.peers, mesh.late, gossips,
+        )
+        manager.broadcast_tick(json_payload, frames)
 
-        await asyncio.sleep(0.1)
+        # Fixed 10Hz cadence: sleep only for what is left of this tick.
+        # After an overrun, restart the schedule from now instead of bursting to catch up.
+        next_tick = max(next_tick + 0.1, loop.time())
+        await asyncio.sleep(next_tick - loop.time())
 
 @app.on_event("startup")
 async def startup_event():
     asyncio.create_task(universe_tick())
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Don't wait on a relic that may never return
+    stop_relic_executor(relic_executor)
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         while True:
             data = await websocket.receive_text()
-            msg = json.loads(data)
-
-            if msg['type'] == 'DEPLOY_CODE':
-                # Update the global execution logic
-                system.code_snippet = msg['payload']
-                await manager.broadcast(json.dumps({
-                    "type": "SYS_EVENT",
-                    "msg": "⚡ NEW ALGORITHM DEPLOYED TO MESH"
-                }))
-
-            elif msg['type'] == 'SET_MODE':
-                system.mode = msg['payload'] # PERSONA or COMPUTE
-                await manager.broadcast(json.dumps({
-                    "type": "SYS_EVENT",
-                    "msg": f"System Mode switched to {system.mode}"
-                }))
-
-            elif msg['type'] == 'PURGE':
-                global nodes
-                nodes = [n for n in nodes if n.id != msg['payload']]
-
-            elif msg['type'] == 'SPAWN':
-                new_id = len(nodes) + int(time.time())
-                nodes.append(NodePersona(new_id, "Anomaly"))
-
+            try:
+                handle_message(websocket, json.loads(data))
+            except (ValueError, KeyError, TypeError):
+                # A malformed message is dropped; it must not take the connection down
+                continue
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
+
+def handle_message(websocket: WebSocket, msg: dict):
+    """Applies one client message. Raises ValueError / KeyError / TypeError when it is malformed."""
+    if msg['type'] == 'DEPLOY_CODE':
+        if not isinstance(msg['payload'], str):
+            raise TypeError("DEPLOY_CODE payload must be a string")
+        # Update the global execution logic (compiled once here, not per tick)
+        system.code_snippet = msg['payload']
+        # Batches of the old script are stale (and may be hung): start from a fresh pool
+        reset_relic_executor()
+        try:
+            compile_script(system.code_snippet)
+            event = "⚡ NEW ALGORITHM DEPLOYED TO MESH"
+        except RelicError as e:
+            # Same as before: a broken script makes every node stagnate
+            event = f"⚠️ DEPLOY FAILED: {e}"
+        manager.broadcast(json.dumps({
+            "type": "SYS_EVENT",
+            "msg": event
+        }))
+
+    elif msg['type'] == 'SET_MODE':
+        if msg['payload'] not in ("PERSONA", "COMPUTE"):
+            raise ValueError(f"unknown mode {msg['payload']!r}")
+        system.mode = msg['payload']
+        manager.broadcast(json.dumps({
+            "type": "SYS_EVENT",
+            "msg": f"System Mode switched to {system.mode}"
+        }))
+
+    elif msg['type'] == 'SET_ENCODING':
+        manager.set_encoding(websocket, msg['payload']) # json or binary
+
+    elif msg['type'] == 'PURGE':
+        mesh.purge(msg['payload'])
+
+    elif msg['type'] == 'SPAWN':
+        mesh.spawn(mesh.next_id(), "Anomaly")
@@ -0,0 +1,149 @@
+"""
+Round trip for the binary TICK frames: a small decoder that follows
+frontend/src/lib/tickCodec.ts applies a keyframe and the deltas after it,
+and the client-side state must match what was encoded.
+
+    cd app/backend && python -m pytest -q test_tick_codec.py
+"""
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from tick_codec import DELTA, DENSE, HEADER, KEYFRAME, TickEncoder
+
+class Reader:
+    def __init__(self, buf):
+        self.buf, self.pos = buf, 0
+
+    def take(self, fmt):
+        values = struct.unpack_from(fmt, self.buf, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return values
+
+    def array(self, dtype, count):
+        out = np.frombuffer(self.buf, dtype=dtype, count=count, offset=self.pos)
+        self.pos += out.nbytes
+        return out
+
+    def rows(self, n):
+        (count,) = self.take("<I")
+        if count == DENSE:
+            return np.arange(n)
+        return self.array("<u4", count)
+
+    def peers(self, count):
+        counts = self.array("u1", count)
+        flat = self.array("<i4", int(counts.sum()))
+        return [list(p) for p in np.split(flat, np.cumsum(counts)[:-1])] if count else []
+
+class Client:
+    """What the browser keeps between frames"""
+
+    def apply(self, frame):
+        r = Reader(frame)
+        kind, mode, dim, seq, scale, n = r.take(HEADER.format)
+        if kind == KEYFRAME:
+            self.ids = r.array("<i4", n).tolist()
+            self.drifts = r.array("<f4", n).tolist()
+            self.names = []
+            for _ in range(n):
+                (length,) = r.take("<H")
+                self.names.append(r.buf[r.pos:r.pos + length].decode())
+                r.pos += length
+            self.q = r.array("<i2", n * dim).reshape(n, dim).copy()
+            self.peer_lists = r.peers(n)
+        else:
+            assert kind == DELTA
+            idx = r.rows(n)
+            self.q[idx] = r.array("<i2", len(idx) * dim).reshape(-1, dim)
+            idx = r.rows(n)
+            for i, p in zip(idx, r.peers(len(idx))):
+                self.peer_lists[i] = p
+        self.scale, self.mode, self.seq = scale, mode, seq
+        self.late = np.unpackbits(r.array("u1", (n + 7) // 8), bitorder="little")[:n].astype(bool)
+        (length,) = r.take("<I")
+        self.gossip = json.loads(r.buf[r.pos:r.pos + length])
+        assert r.pos + length == len(frame)
+
+    @property
+    def vectors(self):
+        return self.q * np.float32(self.scale)
+
+def ticks(n=20, dim=3, steps=30, k=2, seed=0, move=0.3):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim))
+    for t in range(steps):
+        moving = rng.random(n) < move
+        vectors = vectors + moving[:, None] * rng.normal(scale=0.05, size=(n, dim))
+        if t % 3 == 0:
+            peers = rng.integers(0, n, size=(n, k))
+        late = rng.random(n) < 0.1
+        yield vectors, peers, late, [{"from": t % n, "to": (t + 1) % n}]
+
+def check(client, vectors, peers, late, gossip, encoder):
+    assert client.seq == encoder.seq
+    np.testing.assert_allclose(client.vectors, vectors, atol=client.scale)
+    assert client.peer_lists == [list(p) for p in peers]
+    assert np.array_equal(client.late, late)
+    assert client.gossip == gossip
+
+@pytest.mark.parametrize("move", [0.1, 0.9])
+def test_keyframe_then_deltas(move):
+    n = 20
+    encoder = TickEncoder(keyframe_interval=10)
+    client = Client()
+    ids, names, drifts = list(range(n)), [f"n{i}" for i in range(n)], [0.5] * n
+    keyframes = 0
+    for vectors, peers, late, gossip in ticks(n=n, move=move):
+        frames = encoder.encode("PERSONA", ids, names, drifts, vectors, peers, late, gossip)
+        if frames.delta is None:
+            keyframes += 1
+            client.apply(frames.keyframe)
+        else:
+            client.apply(frames.delta)
+        check(client, vectors, peers, late, gossip, encoder)
+    assert client.ids == ids and client.names == names
+    assert keyframes == 3  # 1 + every keyframe_interval deltas
+
+def test_late_joiner_can_start_from_any_keyframe():
+    n = 8
+    encoder = TickEncoder(keyframe_interval=100)
+    ids, names, drifts = list(range(n)), [f"ノード{i}" for i in range(n)], [0.0] * n
+    client = None
+    for t, (vectors, peers, late, gossip) in enumerate(ticks(n=n, steps=12)):
+        frames = encoder.encode("COMPUTE", ids, names, drifts, vectors, peers, late, gossip)
+        if t == 5:
+            client = Client()
+            client.apply(frames.keyframe)
+        elif client is not None:
+            client.apply(frames.delta)
+        if client is not None:
+            check(client, vectors, peers, late, gossip, encoder)
+    assert client.names == names and client.mode == 1
+
+def test_list_peers_and_peer_interval():
+    n = 6
+    encoder = TickEncoder(peer_interval=3)
+    client = Client()
+    ids, names, drifts = list(range(n)), [str(i) for i in range(n)], [0.0] * n
+    vectors = np.ones((n, 2))
+    sent = None
+    for t in range(7):
+        peers = [[(i + t) % n] * (1 + i % 3) for i in range(n)]
+        frames = encoder.encode("PERSONA", ids, names, drifts, vectors, peers, np.zeros(n), [])
+        client.apply(frames.keyframe if frames.delta is None else frames.delta)
+        if t % 3 == 0:
+            sent = peers
+        # Between peer updates the client keeps the lists it was last sent
+        assert client.peer_lists == sent
+
+def test_dense_rows_when_most_vectors_change():
+    n = 10
+    encoder = TickEncoder()
+    args = (list(range(n)), ["x"] * n, [0.0] * n)
+    encoder.encode("PERSONA", *args, np.zeros((n, 3)), np.zeros((n, 1), int), np.zeros(n), [])
+    frames = encoder.encode("PERSONA", *args, np.ones((n, 3)), np.zeros((n, 1), int), np.zeros(n), [])
+    (count,) = struct.unpack_from("<I", frames.delta, HEADER.size)
+    assert count == DENSE
@@ -0,0 +1,175 @@
+"""
+Binary TICK frames for the /ws feed (keyframe + delta).
+
+Clients opt in with {"type": "SET_ENCODING", "payload": "binary"}; everyone else
+keeps receiving the JSON TICK. A binary client first gets a KEYFRAME with the
+static node metadata (ids, names, drift) and every vector/peer list, then one
+DELTA per tick carrying only the vectors whose quantized value changed and the
+nodes whose peer list changed. Peer lists go out at most every peer_interval
+ticks (and on every keyframe); in between the client keeps the last ones sent.
+Vectors are int16 with a per-keyframe scale (value = q * scale).
+Decoder: frontend/src/lib/tickCodec.ts.
+
+All integers are little-endian.
+
+    header   <BBHIfI  type (1=KEYFRAME, 2=DELTA), mode (0=PERSONA, 1=COMPUTE),
+                      dim, seq, scale, node_count
+    KEYFRAME i32 ids[N] | f32 drift[N] | (u16 len, utf-8 name) * N
+             | i16 vectors[N*dim] | u8 peer_count[N] | i32 peer_ids[...]
+    DELTA    rows | i16 vectors[n*dim]
+             | rows | u8 peer_count[m] | i32 peer_ids[...]
+    rows     u32 n | u32 idx[n], or u32 0xFFFFFFFF alone = every node in order (n = N)
+    both     u8 late_bits[ceil(N/8)] (LSB first) | u32 len | utf-8 JSON gossip list
+
+Indices in a DELTA refer to node order in the last KEYFRAME. When more than half
+the rows changed, the dense form is used, so a busy delta never outgrows a keyframe.
+"""
+import json
+import struct
+from functools import cached_property
+
+import numpy as np
+
+KEYFRAME = 1
+DELTA = 2
+MODES = {"PERSONA": 0, "COMPUTE": 1}
+
+HEADER = struct.Struct("<BBHIfI")
+INT16_MAX = 32767
+DENSE = 0xFFFFFFFF  # row count meaning "every row, in order, no index list"
+
+def _rows(idx, n):
+    """
+    Row selection header for a DELTA section and the matching selector.
+    Listing more than half the rows costs more than it saves, so send them all instead.
+    """
+    if len(idx) * 2 > n:
+        return struct.pack("<I", DENSE), slice(None)
+    return struct.pack("<I", len(idx)) + np.asarray(idx, dtype="<u4").tobytes(), idx
+
+def _late_bits(late):
+    return np.packbits(np.asarray(late, dtype=bool), bitorder="little").tobytes()
+
+def _gossip(gossip):
+    body = json.dumps(gossip).encode()
+    return struct.pack("<I", len(body)) + body
+
+def _peer_section(peers):
+    if isinstance(peers, np.ndarray):
+        # (N, k) peer-id array: every node has k peers
+        counts = np.full(len(peers), peers.shape[1], dtype=np.uint8)
+        return counts.tobytes() + peers.astype("<i4").tobytes()
+    counts = np.array([len(p) for p in peers], dtype=np.uint8)
+    flat = np.fromiter((pid for p in peers for pid in p), dtype="<i4", count=int(counts.sum()))
+    return counts.tobytes() + flat.tobytes()
+
+class TickFrames:
+    """One tick's encodings. `delta` is None when this tick must be a keyframe."""
+
+    def __init__(self, encoder, delta):
+        self._encoder = encoder
+        self._state = encoder._snapshot()
+        self.seq = encoder.seq
+        self.delta = delta
+
+    @cached_property
+    def keyframe(self) -> bytes:
+        return self._encoder._keyframe(*self._state)
+
+class TickEncoder:
+    def __init__(self, keyframe_interval=100, peer_interval=1):
+        self.keyframe_interval = keyframe_interval
+        self.peer_interval = peer_interval
+        self.seq = 0
+        self._meta = None        # (ids, names, drifts) of the last keyframe
+        self._scale = None
+        self._q = None           # last sent quantized vectors (N, dim)
+        self._peers = None       # last sent peer lists
+        self._since_keyframe = 0
+        self._since_peers = 0
+        self._tick = None        # (mode, late, gossip) of the current tick
+
+    def _quantize(self, vectors):
+        return np.clip(np.rint(vectors / self._scale), -INT16_MAX, INT16_MAX).astype("<i2")
+
+    def _snapshot(self):
+        # An ndarray peer table is replaced (never mutated) on each tick, so it can be shared
+        peers = self._peers if isinstance(self._peers, np.ndarray) else list(self._peers)
+        return (self.seq, self._meta, self._scale, self._q.copy(), peers, *self._tick)
+
+    def _keyframe(self, seq, meta, scale, q, peers, mode, late, gossip):
+        ids, names, drifts = meta
+        n, dim = q.shape
+        out = [
+            HEADER.pack(KEYFRAME, MODES.get(mode, 0), dim, seq, scale, n),
+            np.asarray(ids, dtype="<i4").tobytes(),
+            np.asarray(drifts, dtype="<f4").tobytes(),
+        ]
+        for name in names:
+            raw = name.encode()
+            out.append(struct.pack("<H", len(raw)) + raw)
+        out += [q.tobytes(), _peer_section(peers), _late_bits(late), _gossip(gossip)]
+        return b"".join(out)
+
+    def encode(self, mode, ids, names, drifts, vectors, peers, late, gossip) -> TickFrames:
+        """
+        Advances the encoder by one tick and returns its frames.
+        vectors is (N, dim); peers is a list of peer-id lists in the same node order,
+        or an (N, k) array of peer ids when every node has the same number of peers.
+        """
+        vectors = np.asarray(vectors, dtype=float)
+        meta = (list(ids), list(names), [float(d) for d in drifts])
+        self.seq += 1
+        self._tick = (mode, np.asarray(late, dtype=bool).copy(), gossip)
+
+        need_keyframe = (
+            self._meta != meta
+            or self._since_keyframe >= self.keyframe_interval
+            or np.abs(vectors).max(initial=0.0) > self._scale * INT16_MAX
+        )
+        if need_keyframe:
+            # Leave headroom so vectors can grow 2x before the scale has to change
+            self._scale = max(5.0, 2 * float(np.abs(vectors).max(initial=0.0))) / INT16_MAX
+            self._meta = meta
+            self._q = self._quantize(vectors)
+            self._peers = peers.copy() if isinstance(peers, np.ndarray) else [list(p) for p in peers]
+            self._since_keyframe = 0
+            self._since_peers = 0
+            return TickFrames(self, None)
+
+        n, dim = vectors.shape
+        q = self._quantize(vectors)
+        changed = np.flatnonzero((q != self._q).any(axis=1))
+        self._q[changed] = q[changed]
+        vector_rows, sel = _rows(changed, n)
+        vector_section = vector_rows + q[sel].tobytes()
+
+        self._since_keyframe += 1
+        self._since_peers += 1
+        if self._since_peers < self.peer_interval:
+            # Not due yet: the client keeps the peer lists it already has
+            peer_section = struct.pack("<I", 0)
+        elif isinstance(peers, np.ndarray) and isinstance(self._peers, np.ndarray) and peers.shape == self._peers.shape:
+            self._since_peers = 0
+            peer_changed = np.flatnonzero((peers != self._peers).any(axis=1))
+            self._peers = peers.copy()
+            peer_rows, sel = _rows(peer_changed, n)
+            peer_section = peer_rows + _peer_section(peers[sel])
+        else:
+            self._since_peers = 0
+            if isinstance(self._peers, np.ndarray):
+                self._peers = self._peers.tolist()
+            peers = [list(p) for p in peers]
+            peer_changed = [i for i, p in enumerate(peers) if p != self._peers[i]]
+            for i in peer_changed:
+                self._peers[i] = peers[i]
+            peer_rows, sel = _rows(peer_changed, n)
+            peer_section = peer_rows + _peer_section(peers[sel] if isinstance(sel, slice) else [peers[i] for i in sel])
+
+        delta = b"".join([
+            HEADER.pack(DELTA, MODES.get(mode, 0), dim, self.seq, self._scale, n),
+            vector_section,
+            peer_section,
+            _late_bits(late), _gossip(gossip),
+        ])
+        return TickFrames(self, delta)
@@ -11,6 +11,7 @@ import { Activity, Cpu, MessageSquare, Shield, Network, Zap, Terminal, Plus, Tra
 import { motion, AnimatePresence } from 'framer-motion';
 import Editor from '@monaco-editor/react';
 import { cn } from '@/lib/utils';
+import { TickDecoder } from '@/lib/tickCodec';
 
 // --- Types ---
 type Node = {
@@ -19,6 +20,7 @@ type Node = {
   vector: number[];
   drift: number;
   peers: number[];
+  late?: boolean;
 };
 
 type Gossip = {
@@ -111,9 +113,20 @@ export default function Gateway() {
   // Connect
   useEffect(() => {
     const ws = new WebSocket('ws://localhost:8000/ws');
+    const decoder = new TickDecoder();
+    ws.binaryType = 'arraybuffer';
+    // Ask for keyframe/delta binary TICK frames; SYS_EVENTs stay JSON text
+    ws.onopen = () => ws.send(JSON.stringify({ type: 'SET_ENCODING', payload: 'binary' }));
     setSocket(ws);
     ws.onmessage = (e) => {
-      const data = JSON.parse(e.data);
+      let data;
+      if (e.data instanceof ArrayBuffer) {
+        const frame = decoder.decode(e.data);
+        if (!frame) return;
+        data = { type: 'TICK', ...frame };
+      } else {
+        data = JSON.parse(e.data);
+      }
       if (data.type === 'TICK') {
         setNodes(data.nodes);
         setSystemMode(data.mode);
@@ -0,0 +1,96 @@
+// Decoder for the binary TICK frames produced by backend/tick_codec.py.
+// Keeps the last keyframe's node table and applies deltas on top of it.
+
+export type TickNode = {
+  id: number;
+  name: string;
+  vector: number[];
+  drift: number;
+  peers: number[];
+  late: boolean;
+};
+
+export type TickFrame = {
+  mode: string;
+  nodes: TickNode[];
+  gossip: any[];
+};
+
+const KEYFRAME = 1;
+const DELTA = 2;
+const DENSE = 0xffffffff; // row count meaning "every node in order, no index list"
+const MODES = ['PERSONA', 'COMPUTE'];
+const utf8 = new TextDecoder();
+
+export class TickDecoder {
+  private nodes: TickNode[] = [];
+  private synced = false;
+
+  // Returns null for a delta that arrives before any keyframe (the server resends one).
+  decode(buf: ArrayBuffer): TickFrame | null {
+    const view = new DataView(buf);
+    let o = 0;
+    const type = view.getUint8(o); o += 1;
+    const mode = MODES[view.getUint8(o)] ?? 'PERSONA'; o += 1;
+    const dim = view.getUint16(o, true); o += 2;
+    o += 4; // seq
+    const scale = view.getFloat32(o, true); o += 4;
+    const n = view.getUint32(o, true); o += 4;
+
+    const readVector = () => {
+      const v = new Array(dim);
+      for (let d = 0; d < dim; d++) { v[d] = view.getInt16(o, true) * scale; o += 2; }
+      return v;
+    };
+    const readPeers = (count: number) => {
+      const p = new Array(count);
+      for (let k = 0; k < count; k++) { p[k] = view.getInt32(o, true); o += 4; }
+      return p;
+    };
+    // Row list of a DELTA section: explicit indices, or every node when the count is DENSE
+    const readRows = () => {
+      const count = view.getUint32(o, true); o += 4;
+      if (count === DENSE) return Array.from({ length: n }, (_, i) => i);
+      const idx = new Array(count);
+      for (let k = 0; k < count; k++) { idx[k] = view.getUint32(o, true); o += 4; }
+      return idx;
+    };
+
+    if (type === KEYFRAME) {
+      const nodes: TickNode[] = [];
+      for (let i = 0; i < n; i++) { nodes.push({ id: view.getInt32(o, true), name: '', vector: [], drift: 0, peers: [], late: false }); o += 4; }
+      for (let i = 0; i < n; i++) { nodes[i].drift = view.getFloat32(o, true); o += 4; }
+      for (let i = 0; i < n; i++) {
+        const len = view.getUint16(o, true); o += 2;
+        nodes[i].name = utf8.decode(new Uint8Array(buf, o, len)); o += len;
+      }
+      for (let i = 0; i < n; i++) nodes[i].vector = readVector();
+      const counts = new Uint8Array(buf, o, n); o += n;
+      for (let i = 0; i < n; i++) nodes[i].peers = readPeers(counts[i]);
+      this.nodes = nodes;
+      this.synced = true;
+    } else if (type === DELTA) {
+      if (!this.synced) return null;
+      // Copy-on-write so React sees new objects only for nodes that changed
+      const nodes = this.nodes.slice();
+      const idx = readRows();
+      for (const i of idx) nodes[i] = { ...nodes[i], vector: readVector() };
+      const pidx = readRows();
+      const counts = new Uint8Array(buf, o, pidx.length); o += pidx.length;
+      pidx.forEach((i, k) => { nodes[i] = { ...nodes[i], peers: readPeers(counts[k]) }; });
+      this.nodes = nodes;
+    } else {
+      return null;
+    }
+
+    const lateBits = new Uint8Array(buf, o, Math.ceil(n / 8)); o += lateBits.length;
+    this.nodes = this.nodes.map((node, i) => {
+      const late = ((lateBits[i >> 3] >> (i & 7)) & 1) === 1;
+      return node.late === late ? node : { ...node, late };
+    });
+    const gossipLen = view.getUint32(o, true); o += 4;
+    const gossip = JSON.parse(utf8.decode(new Uint8Array(buf, o, gossipLen)));
+
+    return { mode, nodes: this.nodes, gossip };
+  }
+}
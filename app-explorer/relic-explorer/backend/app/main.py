@@ -1,13 +1,16 @@
 import asyncio
+import json
 import logging
-import random
-from fastapi import FastAPI, WebSocket
+import os
+from fastapi import FastAPI, WebSocket, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List
 import numpy as np
 
-from .node import PersonaNode
+from relic_shared.relic_cache import compile_function, RelicError
+
+from .node import NodeStore
 
 app = FastAPI()
 
@@ -20,32 +23,57 @@ app.add_middleware(
 
 # --- System State ---
 DIM = 8
-NODE_COUNT = 6
-NODES = []
+NODE_COUNT = int(os.getenv("NODE_COUNT", "6"))
 # Pre-defined personalities
 PERSONAS = ["The Yes Man", "The Contrarian", "The Rotator", "The Filter", "The Chaos", "The Chaos"]
 
-# Initialize Nodes
-for i in range(NODE_COUNT):
-    p_name = PERSONAS[i % len(PERSONAS)]
-    NODES.append(PersonaNode(f"node_{i}", DIM, p_name))
+# Initialize Nodes (NODES[i] is a PersonaNode view onto row i of STORE)
+STORE = NodeStore(DIM, capacity=NODE_COUNT)
+NODES = [STORE.add(f"node_{i}", PERSONAS[i % len(PERSONAS)]) for i in range(NODE_COUNT)]
 
 # Relic Code Storage
 current_relic_code = None
 compiled_relic = None
 
+class SnapshotPublisher:
+    """シミュレーションループが1サイクルに1回だけ作る、シリアライズ済みの不変スナップショット
+
+    /ws と /state はこれを共有し、version が変わった時だけ送る。
+    """
+    def __init__(self):
+        self.version = 0
+        self.body = "[]"
+        self.etag = '"0"'
+        self._changed = asyncio.Event()
+
+    def publish(self, data):
+        self.body = json.dumps(data)
+        self.version += 1
+        self.etag = f'"{self.version}"'
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_newer(self, version, timeout=None):
+        """version より新しいスナップショットが出るまで待つ (timeout 秒で諦める)"""
+        if self.version > version:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+snapshot = SnapshotPublisher()
+
 class DeployPayload(BaseModel):
     code: str
 
 def compile_user_code(code_str):
     """ユーザーのPythonコードを安全でない方法でコンパイルする (MVP仕様)"""
-    scope = {}
     try:
         # Expected function: update(self_vec, neighbor_vec) -> new_vec
-        exec(code_str, {}, scope)
-        if 'update' in scope:
-            return scope['update']
-    except Exception as e:
+        return compile_function(code_str, "update", arity=2)
+    except RelicError as e:
         print(f"Compilation Error: {e}")
     return None
 
@@ -53,26 +81,38 @@ def compile_user_code(code_str):
 async def simulation_loop():
     while True:
         # 1. Random Gossip
-        for node in NODES:
-            # Pick a random target
-            target = random.choice([n for n in NODES if n != node])
-            target.receive(node.x)
+        # 各ノードが自分以外のランダムな1ノードに belief を送る
+        n = len(STORE)
+        if n > 1:
+            targets = (np.arange(n) + np.random.randint(1, n, size=n)) % n
+            STORE.receive(targets, STORE.x)
 
-        # 2. Process & Evolve
-        for node in NODES:
-            node.process_cycle(relic_func=compiled_relic)
+        # 2. Process & Evolve (ネットワーク全体を一括更新)
+        STORE.process_cycle(relic_func=compiled_relic)
+
+        # 3. Publish (全クライアント共通で1回だけシリアライズ)
+        snapshot.publish(STORE.get_states())
 
         await asyncio.sleep(0.5)
 
 @app.on_event("startup")
 async def startup_event():
+    snapshot.publish(STORE.get_states())
     asyncio.create_task(simulation_loop())
 
 # --- Endpoints ---
 
+MAX_LONG_POLL = 30.0
+
 @app.get("/state")
-def get_state():
-    return [n.get_state() for n in NODES]
+async def get_state(request: Request, wait: float = 0.0):
+    """最新スナップショット。If-None-Match が現在の ETag と一致する場合、
+    wait 秒まで新しい版を待ち (long-polling)、それでも変わらなければ 304 を返す"""
+    if request.headers.get("if-none-match") == snapshot.etag:
+        version = snapshot.version
+        if wait <= 0 or not await snapshot.wait_newer(version, min(wait, MAX_LONG_POLL)):
+            return Response(status_code=304, headers={"ETag": snapshot.etag})
+    return Response(content=snapshot.body, media_type="application/json", headers={"ETag": snapshot.etag})
 
 @app.post("/deploy")
 def deploy_relic(payload: DeployPayload):
@@ -85,10 +125,11 @@ def deploy_relic(payload: DeployPayload):
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     try:
+        version = -1
         while True:
-            # Stream the entire network state
-            data = [n.get_state() for n in NODES]
-            await websocket.send_json(data)
-            await asyncio.sleep(0.1)
+            # Stream the entire network state (only when a new snapshot is published)
+            await snapshot.wait_newer(version)
+            version = snapshot.version
+            await websocket.send_text(snapshot.body)
     except Exception:
         pass
@@ -1,82 +1,267 @@
 import numpy as np
 from .presets import generate_persona
 
-class PersonaNode:
-    def __init__(self, node_id, dim, persona_name="The Chaos"):
-        self.node_id = node_id
+class NodeStore:
+    """全ノードの状態を struct-of-arrays で持つストア
+
+    belief x (N, dim), 人格行列 P / P_initial (N, dim, dim), drift (N,) と
+    受信箱 (宛先 index + ベクトルの追記バッファ。サイクル時に宛先でソートして
+    CSR 形式 indptr/data にまとめる) を事前確保した配列に置き、
+    集約・tanh 解釈・正規化・Hebbian 更新をネットワーク全体で一括実行する。
+    PersonaNode はこのストアの1行へのビュー。
+    """
+
+    def __init__(self, dim, capacity=8, alpha=0.6, lr=0.01):
         self.dim = dim
-        self.name = persona_name
+        self.n = 0
+        self.node_ids = []
+        self.names = []
+
+        capacity = max(capacity, 1)
+        self._x = np.zeros((capacity, dim))
+        self._P = np.zeros((capacity, dim, dim))
+        self._P_initial = np.zeros((capacity, dim, dim))
+        # Drift = ||P - P_initial||_F, maintained incrementally in process_cycle
+        self._drift_sq = np.zeros(capacity)
+        self._drift = np.zeros(capacity)
+        # Learning Parameters (per node)
+        self.default_alpha, self.default_lr = alpha, lr
+        self._alpha = np.zeros(capacity)  # Self-confidence
+        self._lr = np.zeros(capacity)     # Adaptation rate (Drift)
+
+        # Buffer for incoming gossip
+        self._inbox_target = np.zeros(capacity, dtype=np.int64)
+        self._inbox_data = np.zeros((capacity, dim))
+        self._inbox_len = 0
+
+    # --- Views over the live rows ---
+    x = property(lambda self: self._x[:self.n])
+    P = property(lambda self: self._P[:self.n])
+    P_initial = property(lambda self: self._P_initial[:self.n])
+    drift = property(lambda self: self._drift[:self.n])
+    alpha = property(lambda self: self._alpha[:self.n])
+    lr = property(lambda self: self._lr[:self.n])
+
+    def _grow(self, capacity):
+        for attr in ("_x", "_P", "_P_initial", "_drift_sq", "_drift", "_alpha", "_lr"):
+            old = getattr(self, attr)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, attr, new)
+
+    def add(self, node_id, persona_name="The Chaos"):
+        """ノードを1つ追加し、そのビューを返す"""
+        if self.n == len(self._x):
+            self._grow(2 * self.n)
+        i = self.n
+        self.n += 1
+        self.node_ids.append(node_id)
+        self.names.append(persona_name)
 
         # Identity Matrix P (The Persona)
-        self.P = generate_persona(persona_name, dim)
-        self.P_initial = self.P.copy()
+        self._P[i] = generate_persona(persona_name, self.dim)
+        self._P_initial[i] = self._P[i]
+        self._drift_sq[i] = 0.0
+        self._drift[i] = 0.0
+        self._alpha[i] = self.default_alpha
+        self._lr[i] = self.default_lr
 
         # State Vector x (The Belief)
-        self.x = np.random.randn(dim)
-        self.x = self.x / np.linalg.norm(self.x)
+        x = np.random.randn(self.dim)
+        self._x[i] = x / np.linalg.norm(x)
+        return PersonaNode._view(self, i)
 
-        # Buffer for incoming gossip
-        self.inbox = []
+    def node(self, i):
+        return PersonaNode._view(self, i)
 
-        # Learning Parameters
-        self.alpha = 0.6  # Self-confidence
-        self.lr = 0.01    # Adaptation rate (Drift)
+    def __len__(self):
+        return self.n
 
-    def receive(self, vector):
-        self.inbox.append(np.array(vector))
+    def receive(self, targets, vectors):
+        """vectors[k] を targets[k] 番目のノードの受信箱に入れる (コピーされる)"""
+        targets = np.atleast_1d(np.asarray(targets, dtype=np.int64))
+        vectors = np.asarray(vectors, dtype=float).reshape(len(targets), self.dim)
+        end = self._inbox_len + len(targets)
+        if end > len(self._inbox_target):
+            capacity = max(end, 2 * len(self._inbox_target))
+            target = np.zeros(capacity, dtype=np.int64)
+            data = np.zeros((capacity, self.dim))
+            target[:self._inbox_len] = self._inbox_target[:self._inbox_len]
+            data[:self._inbox_len] = self._inbox_data[:self._inbox_len]
+            self._inbox_target, self._inbox_data = target, data
+        self._inbox_target[self._inbox_len:end] = targets
+        self._inbox_data[self._inbox_len:end] = vectors
+        self._inbox_len = end
 
-    def process_cycle(self, relic_func=None):
-        """1ステップの思考サイクル"""
-        if not self.inbox:
-            return
+    def inbox_count(self):
+        return np.bincount(self._inbox_target[:self._inbox_len], minlength=self.n)
+
+    def _drain_inbox(self, rows=None):
+        """受信箱を宛先ごとの平均にまとめて空にする (rows 指定時はその宛先分だけ取り出す)
+
+        Returns (active rows, neighbor_signal (len(active), dim)).
+        """
+        target = self._inbox_target[:self._inbox_len]
+        data = self._inbox_data[:self._inbox_len]
+        if rows is not None:
+            take = np.isin(target, rows)
+            keep = ~take
+            target, data = target[take], data[take]
+            rest = int(keep.sum())
+            self._inbox_target[:rest] = self._inbox_target[:self._inbox_len][keep]
+            self._inbox_data[:rest] = self._inbox_data[:self._inbox_len][keep]
+            self._inbox_len = rest
+        else:
+            self._inbox_len = 0  # Clear inbox (data below is read before the next receive)
 
+        # CSR: 宛先順に並べ替え、indptr 区間ごとに合計する
+        order = np.argsort(target, kind="stable")
+        counts = np.bincount(target, minlength=self.n)
+        active = np.flatnonzero(counts)
+        if len(active) == 0:
+            return active, np.zeros((0, self.dim))
+        indptr = np.concatenate(([0], np.cumsum(counts)))
+        sums = np.add.reduceat(data[order], indptr[active], axis=0)
+        return active, sums / counts[active, None]
+
+    def process_cycle(self, relic_func=None, rows=None):
+        """全ノード (rows 指定時はその行だけ) の1ステップの思考サイクル
+
+        受信箱が空のノードは何もしない。
+        """
         # 1. Aggregate Neighbors (Gossip)
         # 他者の意見の平均をとる
-        neighbor_signal = np.mean(self.inbox, axis=0)
-        self.inbox = [] # Clear inbox
+        active, neighbor_signal = self._drain_inbox(rows)
+        if len(active) == 0:
+            return
+
+        x = self._x[active]
+        P = self._P[active]
+        alpha = self._alpha[active, None]
+        lr = self._lr[active]
 
         # 2. Interpretation (The Filter)
         # P @ neighbor
-        interpreted = np.tanh(self.P @ neighbor_signal)
+        P_signal = np.matmul(P, neighbor_signal[:, :, None])[:, :, 0]
+        interpreted = np.tanh(P_signal)
+
+        # Standard Dynamics (Exp D)
+        proposed_x = alpha * x + (1 - alpha) * interpreted
 
         # 3. Relic Execution (Dynamic Function)
         # もしRelic(ユーザーコード)があれば、通常の力学を上書き/修飾する
         if relic_func:
-            try:
-                # User defined update: f(self_x, interpreted)
-                proposed_x = relic_func(self.x, interpreted)
-                # Ensure structure
-                if isinstance(proposed_x, list): proposed_x = np.array(proposed_x)
-            except:
-                # Fallback to standard dynamics if code fails
-                proposed_x = self.alpha * self.x + (1 - self.alpha) * interpreted
-        else:
-            # Standard Dynamics (Exp D)
-            proposed_x = self.alpha * self.x + (1 - self.alpha) * interpreted
+            for k in range(len(active)):
+                try:
+                    # User defined update: f(self_x, interpreted)
+                    result = np.asarray(relic_func(x[k].copy(), interpreted[k]), dtype=float)
+                except Exception:
+                    # Fallback to standard dynamics if code fails
+                    continue
+                # スカラーなど形の違う戻り値を行全体に broadcast しない (失敗と同じく標準の力学のまま)
+                if result.shape == proposed_x[k].shape:
+                    proposed_x[k] = result
 
         # Normalize
-        norm = np.linalg.norm(proposed_x)
-        if norm > 1e-9:
-            new_x = proposed_x / norm
-        else:
-            new_x = proposed_x
+        norm = np.linalg.norm(proposed_x, axis=1, keepdims=True)
+        new_x = np.divide(proposed_x, norm, out=proposed_x, where=norm > 1e-9)
 
         # 4. Adaptation (Exp E - Hebbian Learning)
         # "解釈された結果(new_x)" と "元の入力(neighbor_signal)" の相関でPを更新
         # delta_P = learning_rate * outer(new_x, neighbor_signal)
         # ※ 簡易実装: 直交性を保つための補正は今回は省略(ドリフトを許容)
-        delta_P = np.outer(new_x, neighbor_signal)
-        self.P = self.P + self.lr * delta_P
+
+        # Drift の差分更新 (D = P - P_initial, D' = D + lr * u v^T):
+        # ||D'||^2 = ||D||^2 + 2 lr u.(D v) + lr^2 |u|^2 |v|^2
+        D_signal = P_signal - np.matmul(self._P_initial[active], neighbor_signal[:, :, None])[:, :, 0]
+        self._drift_sq[active] += (
+            2 * lr * np.einsum("ij,ij->i", new_x, D_signal)
+            + lr ** 2 * np.einsum("ij,ij->i", new_x, new_x) * np.einsum("ij,ij->i", neighbor_signal, neighbor_signal)
+        )
+        self._drift[active] = np.sqrt(np.maximum(self._drift_sq[active], 0.0))
+
+        P += lr[:, None, None] * new_x[:, :, None] * neighbor_signal[:, None, :]
+        self._P[active] = P
 
         # Update State
-        self.x = new_x
+        self._x[active] = new_x
+
+    def get_states(self):
+        return [
+            {"id": node_id, "name": name, "vector": vector, "drift": drift}
+            for node_id, name, vector, drift in zip(
+                self.node_ids, self.names, self.x.tolist(), self.drift.tolist()
+            )
+        ]
+
+class PersonaNode:
+    """NodeStore の1行へのビュー (単体で作った場合は1ノードだけのストアを持つ)"""
+
+    def __init__(self, node_id, dim, persona_name="The Chaos"):
+        store = NodeStore(dim, capacity=1)
+        store.add(node_id, persona_name)
+        self._store, self._i = store, 0
+
+    @classmethod
+    def _view(cls, store, i):
+        node = cls.__new__(cls)
+        node._store, node._i = store, i
+        return node
+
+    node_id = property(lambda self: self._store.node_ids[self._i])
+    name = property(lambda self: self._store.names[self._i])
+    dim = property(lambda self: self._store.dim)
+    P_initial = property(lambda self: self._store._P_initial[self._i])
+    drift = property(lambda self: float(self._store._drift[self._i]))
+
+    @property
+    def x(self):
+        return self._store._x[self._i]
+
+    @x.setter
+    def x(self, value):
+        self._store._x[self._i] = value
+
+    @property
+    def P(self):
+        return self._store._P[self._i]
+
+    @P.setter
+    def P(self, value):
+        self._store._P[self._i] = value
+
+    @property
+    def alpha(self):
+        return float(self._store._alpha[self._i])
+
+    @alpha.setter
+    def alpha(self, value):
+        self._store._alpha[self._i] = value
+
+    @property
+    def lr(self):
+        return float(self._store._lr[self._i])
+
+    @lr.setter
+    def lr(self, value):
+        self._store._lr[self._i] = value
+
+    @property
+    def inbox(self):
+        target = self._store._inbox_target[:self._store._inbox_len]
+        return list(self._store._inbox_data[:self._store._inbox_len][target == self._i])
+
+    def receive(self, vector):
+        self._store.receive([self._i], vector)
+
+    def process_cycle(self, relic_func=None):
+        """1ステップの思考サイクル"""
+        self._store.process_cycle(relic_func, rows=[self._i])
 
     def get_state(self):
-        # Calculate Drift
-        drift = np.linalg.norm(self.P - self.P_initial)
         return {
             "id": self.node_id,
             "name": self.name,
             "vector": self.x.tolist(),
-            "drift": float(drift)
+            "drift": self.drift
         }
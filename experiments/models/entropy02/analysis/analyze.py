@@ -1,23 +1,20 @@
-import pandas as pd
+import os
 import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
-import umap
 
-df = pd.read_csv("beliefs.csv")
+from relic_shared import embedding, trajectory
 
-pivot = df.pivot_table(
-    index=["step","node"],
-    columns="dim",
-    values="value"
-).reset_index()
+# controller が書いた .traj を優先し、無ければ CSV (初回にキャッシュを作る) から読む
+source = "beliefs.traj" if os.path.isdir("beliefs.traj") else "beliefs.csv"
 
-X = pivot.drop(columns=["step","node"]).values
+# (T, N, d) -> (T*N, d), 行は (step, node) 順
+B = trajectory.load(source)["belief"]
+X = B.reshape(-1, B.shape[-1])
 
-pca = PCA(n_components=2)
-Xp = pca.fit_transform(X)
-
-u = umap.UMAP(n_components=2, random_state=0)
-Xu = u.fit_transform(X)
+# 入力ファイルの更新時刻を埋め込みキャッシュのキーにする (毎回 X 全体をハッシュしない)
+stamp = os.stat(os.path.join(source, "meta.json") if os.path.isdir(source) else source).st_mtime_ns
+key = f"{source}@{stamp}"
+Xp = embedding.pca(X, key=key)
+Xu = embedding.umap(X, key=key, random_state=0)
 
 plt.figure()
 plt.scatter(Xp[:,0], Xp[:,1], s=5)
@@ -1,6 +1,8 @@
-import csv, time, requests
+import os, time, requests
 import numpy as np
 
+from relic_shared.trajectory import TrajectoryWriter, to_csv
+
 nodes = [
     "http://node1:8000",
     "http://node2:8000",
@@ -19,21 +21,24 @@ def wait():
 wait()
 
 steps = 30
+output = "/analysis/beliefs.traj"
+dim = len(requests.get(nodes[0] + "/state").json()["belief"])
 
-with open("/analysis/beliefs.csv", "w", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow(["step", "node", "dim", "value"])
-
+with TrajectoryWriter(output, nodes=nodes, columns={"belief": (dim,)}) as writer:
     for step in range(steps):
         states = {}
         for n in nodes:
             states[n] = requests.get(n + "/state").json()["belief"]
 
+        beliefs = []
         for n in nodes:
             j = np.random.choice(nodes)
             r = requests.post(n + "/tick", json={"belief": states[j]})
-            b = r.json()["belief"]
-            for d, v in enumerate(b):
-                writer.writerow([step, n, d, v])
+            beliefs.append(r.json()["belief"])
+        writer.append(belief=beliefs)
 
         time.sleep(0.2)
+
+# 1 にすると従来の long 形式 CSV (beliefs.csv) も書き出す
+if os.getenv("CSV_EXPORT", "0") == "1":
+    to_csv(output, "/analysis/beliefs.csv")
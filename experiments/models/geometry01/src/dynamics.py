@@ -19,3 +19,7 @@ def rfpg_step(X, P, G, alpha):
         X_new[i] = normalize(alpha * X[i] + (1 - alpha) * agg)
 
     return X_new
+
+# ===== batched engine =====
+# CSR バッチ実装は projection02 と共通なので relic_shared.rfpg に置いている
+from relic_shared.rfpg import to_csr, stack_personas, normalize_rows, rfpg_rows, rfpg_step_csr  # noqa: E402,F401
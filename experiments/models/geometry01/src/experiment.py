@@ -1,15 +1,25 @@
+import os
+from contextlib import ExitStack
 import numpy as np
 import networkx as nx
-from dynamics import random_orthogonal, rfpg_step
-from metrics import norms, silhouette
+from dynamics import random_orthogonal, rfpg_step, rfpg_step_csr, to_csr, stack_personas
+from relic_shared.sharded import ShardedRunner
+from metrics import MetricsRecorder, STATS_COLUMNS, online_stats, silhouette
 from visualize import plot_pca, plot_umap
 
 # ===== parameters =====
 N = 50
 d = 16
-T = 100
+T = int(os.getenv("T", "100"))
 alpha = 0.6
 clusters = 5
+engine = os.getenv("ENGINE", "csr")  # csr (batched) | sharded (multi-core) | loop (reference)
+workers = int(os.getenv("WORKERS", "0")) or None
+# メトリクスの評価間隔 (ステップ)。silhouette は O(N^2) なので長い実行では間引く
+stats_every = int(os.getenv("STATS_EVERY", "1"))
+silhouette_every = int(os.getenv("SILHOUETTE_EVERY", "1"))
+# 前回の silhouette 評価から X がこれ以上動いていなければ評価を省く
+silhouette_tol = float(os.getenv("SILHOUETTE_TOL", "0"))
 np.random.seed(0)
 
 # ===== graph =====
@@ -24,18 +34,33 @@ X = np.random.randn(N, d)
 X = np.array([x / np.linalg.norm(x) for x in X])
 P = [random_orthogonal(d) for _ in range(N)]
 
-silhouette_ts = []
-norms_ts = []
+# ===== metrics (output/stats.csv, output/silhouette.csv) =====
+recorder = MetricsRecorder("output")
+recorder.add("stats", online_stats, columns=STATS_COLUMNS, every=stats_every)
+recorder.add("silhouette", lambda X: silhouette(X, labels), every=silhouette_every, on_change=silhouette_tol or None)
 
 # ===== dynamics =====
-for t in range(T):
-    X = rfpg_step(X, P, G, alpha)
-    silhouette_ts.append(silhouette(X, labels))
-    norms_ts.append(norms(X).mean())
-
-# ===== save metrics =====
-np.savetxt("output/silhouette.csv", silhouette_ts, delimiter=",")
-np.savetxt("output/norms.csv", norms_ts, delimiter=",")
+# sharded の共有メモリとワーカーは、例外で抜けた場合も含めて with を出るときに解放する
+with ExitStack() as stack:
+    stack.enter_context(recorder)
+    if engine == "csr":
+        A = to_csr(G)
+        P = stack_personas(P)
+        step = lambda X: rfpg_step_csr(X, P, A, alpha)
+    elif engine == "sharded":
+        runner = stack.enter_context(ShardedRunner(X, stack_personas(P), to_csr(G), alpha, workers))
+        step = lambda X: runner.step()
+    elif engine == "loop":
+        step = lambda X: rfpg_step(X, P, G, alpha)
+    else:
+        raise ValueError(f"unknown ENGINE: {engine}")
+
+    for t in range(T):
+        X = step(X)
+        recorder.record(t, X)
+
+    # sharded の X は共有バッファのビューなので、解放する前にコピーする
+    X = np.array(X)
 
 # ===== visualize final =====
 plot_pca(X, "output/belief_pca.png")
@@ -1,3 +1,5 @@
+import os
+
 import numpy as np
 from sklearn.metrics import silhouette_score
 
@@ -8,3 +10,105 @@ def silhouette(X, labels):
     if len(set(labels)) < 2:
         return 0.0
     return silhouette_score(X, labels)
+
+# ===== online statistics =====
+# どれも O(N d) の1パスで求まる量だけを使う。平均ペアワイズ cos は
+# sum_{i != j} u_i . u_j = ||sum_i u_i||^2 - N (u_i は単位ベクトル) から求めるので O(N^2) の行列を作らない
+
+STATS_COLUMNS = ("mean_norm", "mean_cos", "dispersion")
+
+def online_stats(X):
+    """(平均ノルム, 平均ペアワイズ cos, 重心まわりの平均二乗距離)"""
+    N = len(X)
+    sq = np.einsum("ij,ij->i", X, X)
+    n = np.sqrt(sq)
+    mean = X.mean(axis=0)
+    s = (X / np.where(n > 0, n, 1)[:, None]).sum(axis=0)
+    cos = (s @ s - np.count_nonzero(n)) / (N * (N - 1)) if N > 1 else 0.0
+    return n.mean(), cos, sq.mean() - mean @ mean
+
+# ===== recorder =====
+
+class _Metric:
+    __slots__ = ("name", "fn", "every", "on_change", "buf", "fill", "last", "diff", "file")
+
+class MetricsRecorder:
+    """ステップループに差し込むメトリクス記録器
+
+    メトリクスごとに評価間隔 (every ステップごと) と on_change (前回評価時から
+    状態 X の変化が最大絶対値で on_change 以下なら評価を省く) を指定できる。
+    値は固定長のリングバッファ (capacity 行) に溜め、一杯になったら
+    <out_dir>/<name>.csv (t, 列...) に追記するので、ステップ数によらずメモリは一定。
+
+        recorder = MetricsRecorder("output")
+        recorder.add("stats", online_stats, columns=STATS_COLUMNS)
+        recorder.add("silhouette", lambda X: silhouette(X, labels), every=100, on_change=1e-6)
+        with recorder:
+            for t in range(T):
+                X = step(X)
+                recorder.record(t, X)
+    """
+
+    def __init__(self, out_dir, capacity=4096):
+        self.out_dir = out_dir
+        self.capacity = capacity
+        self._metrics = []
+        os.makedirs(out_dir, exist_ok=True)
+
+    def add(self, name, fn, columns=None, every=1, on_change=None):
+        """fn(X) はスカラーか len(columns) 個の値を返す"""
+        columns = tuple(columns or (name,))
+        m = _Metric()
+        m.name, m.fn, m.every, m.on_change = name, fn, max(1, int(every)), on_change
+        m.buf = np.empty((self.capacity, 1 + len(columns)))
+        m.fill = 0
+        m.last = m.diff = None
+        m.file = open(os.path.join(self.out_dir, f"{name}.csv"), "w")
+        m.file.write(",".join(("t",) + columns) + "\n")
+        self._metrics.append(m)
+        return self
+
+    def record(self, t, X):
+        for m in self._metrics:
+            if t % m.every:
+                continue
+            if m.on_change is not None:
+                # 差分は事前に確保したバッファ diff の上で計算し、ステップごとの確保をしない
+                if m.last is None or m.last.shape != np.shape(X):
+                    m.last = np.array(X, dtype=float)
+                    m.diff = np.empty_like(m.last)
+                else:
+                    np.subtract(X, m.last, out=m.diff)
+                    np.abs(m.diff, out=m.diff)
+                    if m.diff.max() <= m.on_change:
+                        continue
+                    np.copyto(m.last, X)
+            row = m.buf[m.fill]
+            row[0] = t
+            row[1:] = m.fn(X)
+            m.fill += 1
+            if m.fill == self.capacity:
+                self._flush(m)
+
+    def _flush(self, m):
+        if m.fill:
+            np.savetxt(m.file, m.buf[:m.fill], delimiter=",",
+                       fmt=["%d"] + ["%.18e"] * (m.buf.shape[1] - 1))
+            m.file.flush()
+            m.fill = 0
+
+    def flush(self):
+        for m in self._metrics:
+            self._flush(m)
+
+    def close(self):
+        self.flush()
+        for m in self._metrics:
+            m.file.close()
+        self._metrics = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,57 @@
+"""MetricsRecorder の評価間隔・on_change・リングバッファの書き出しと online_stats
+
+    cd src && python -m pytest -q test_metrics.py
+"""
+import numpy as np
+
+from metrics import MetricsRecorder, online_stats
+
+def read_csv(path):
+    with open(path) as f:
+        header = f.readline().strip().split(",")
+    return header, np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+
+def test_cadence_and_columns(tmp_path):
+    calls = []
+    recorder = MetricsRecorder(str(tmp_path), capacity=3)
+    recorder.add("a", lambda X: (calls.append(1), X.sum())[1], every=4)
+    recorder.add("b", lambda X: (X.min(), X.max()), columns=("lo", "hi"))
+    with recorder:
+        for t in range(10):
+            recorder.record(t, np.full((2, 2), float(t)))
+    assert len(calls) == 3
+    header, rows = read_csv(tmp_path / "a.csv")
+    assert header == ["t", "a"]
+    assert rows[:, 0].tolist() == [0, 4, 8]
+    assert rows[:, 1].tolist() == [0, 16, 32]
+    # capacity (3 行) を超えた分も flush で順に追記される
+    header, rows = read_csv(tmp_path / "b.csv")
+    assert header == ["t", "lo", "hi"]
+    assert rows[:, 0].tolist() == list(range(10))
+
+def test_on_change_skips_until_x_moves(tmp_path):
+    calls = []
+    recorder = MetricsRecorder(str(tmp_path))
+    recorder.add("m", lambda X: (calls.append(1), 0.0)[1], every=2, on_change=1e-3)
+    X = np.zeros((4, 3))
+    with recorder:
+        for t in range(12):
+            if t == 5:
+                X = X + 1e-4   # 閾値以下の変化は無視
+            if t == 7:
+                X = X + 1.0
+            recorder.record(t, X)
+    _, rows = read_csv(tmp_path / "m.csv")
+    assert rows[:, 0].tolist() == [0, 8]
+    assert len(calls) == 2
+
+def test_online_stats_matches_direct_computation():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(30, 5))
+    mean_norm, mean_cos, dispersion = online_stats(X)
+    n = np.linalg.norm(X, axis=1)
+    U = X / n[:, None]
+    C = U @ U.T
+    np.testing.assert_allclose(mean_norm, n.mean())
+    np.testing.assert_allclose(mean_cos, (C.sum() - np.trace(C)) / (30 * 29))
+    np.testing.assert_allclose(dispersion, ((X - X.mean(axis=0)) ** 2).sum(axis=1).mean())
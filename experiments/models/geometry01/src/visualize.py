@@ -1,9 +1,13 @@
+import os
 import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
-import umap
+from relic_shared import embedding
+
+def _cache_dir(path):
+    # 埋め込みのキャッシュは出力画像と同じディレクトリに置く
+    return os.path.join(os.path.dirname(path) or ".", ".embed_cache")
 
 def plot_pca(X, path):
-    Z = PCA(n_components=2).fit_transform(X)
+    Z = embedding.pca(X, cache_dir=_cache_dir(path))
     plt.figure()
     plt.scatter(Z[:,0], Z[:,1], s=10)
     plt.title("Belief PCA")
@@ -11,7 +15,7 @@ def plot_pca(X, path):
     plt.close()
 
 def plot_umap(X, path):
-    Z = umap.UMAP(n_components=2).fit_transform(X)
+    Z = embedding.umap(X, cache_dir=_cache_dir(path))
     plt.figure()
     plt.scatter(Z[:,0], Z[:,1], s=10)
     plt.title("Belief UMAP")
@@ -1,18 +1,21 @@
 import yaml, sys, os
 import numpy as np
 from sklearn.metrics import silhouette_score
-from sklearn.decomposition import PCA
-import umap
 import matplotlib.pyplot as plt
+from relic_shared import embedding
 
-def run(config_path):
+def load_config(config_path):
     with open(config_path) as f:
-        cfg = yaml.safe_load(f)
+        return yaml.safe_load(f)
+
+def run(config_path):
+    run_config(load_config(config_path))
 
+def run_config(cfg, results_dir="results"):
     np.random.seed(cfg["seed"])
     name = cfg["name"]
 
-    out_dir = f"results/{name}"
+    out_dir = f"{results_dir}/{name}"
     os.makedirs(out_dir, exist_ok=True)
 
     X = np.random.randn(200, 16)
@@ -25,12 +28,14 @@ def run(config_path):
     with open(f"{out_dir}/metrics.txt", "w") as f:
         f.write(f"silhouette={sil}\n")
 
-    X_pca = PCA(n_components=2).fit_transform(X)
+    # 設定が違っても X が同じなら埋め込みは使い回せるので、キャッシュは results/ 直下で共有する
+    cache_dir = os.path.join(os.path.dirname(out_dir), ".embed_cache")
+    X_pca = embedding.pca(X, cache_dir=cache_dir)
     plt.scatter(X_pca[:,0], X_pca[:,1], c=labels, s=5)
     plt.savefig(f"{out_dir}/pca.png")
     plt.clf()
 
-    X_umap = umap.UMAP(n_components=2).fit_transform(X)
+    X_umap = embedding.umap(X, cache_dir=cache_dir)
     plt.scatter(X_umap[:,0], X_umap[:,1], c=labels, s=5)
     plt.savefig(f"{out_dir}/umap.png")
     plt.clf()
@@ -0,0 +1,163 @@
+"""YAML 設定のスイープをプロセスプールで回すランナー
+
+設定ファイルに grid: があれば、その直積を1件ずつの run に展開する。
+
+    name: expA
+    graph: fixed
+    projection: identity
+    seed: 42
+    grid:
+      seed: [1, 2, 3]
+      projection: [identity, gossip]
+
+展開後の run 名は expA__seed=1__projection=identity のようになる (grid が無ければ name のまま)。
+各 run の設定 + run_experiment.py のソースのハッシュを results/<name>/run.json に記録し、
+同じハッシュの run.json と metrics.txt が既にあればその run は飛ばす。
+設定を1つ編集して再実行すると、ハッシュが変わった run だけが再計算される。
+
+run.json には実行時間 (wall_time 秒) と最大 RSS (peak_rss_mb) も残し、
+スイープ全体の一覧を results/sweep.csv に書く。
+
+    python src/sweep.py configs/               # configs/*.yaml をすべて
+    WORKERS=4 python src/sweep.py configs/expA.yaml configs/expC.yaml
+    FORCE=1 python src/sweep.py configs/       # キャッシュを無視して全部回す
+
+Docker イメージの ENTRYPOINT はこのスクリプトで、引数を省くと configs/ をすべて回す。
+"""
+import csv
+import glob
+import hashlib
+import itertools
+import json
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.getenv("RESULTS_DIR", "results")
+WORKERS = int(os.getenv("WORKERS", "0")) or os.cpu_count()
+FORCE = os.getenv("FORCE", "0") == "1"
+RUN_META = "run.json"
+OUTPUTS = ("metrics.txt",)
+
+def code_digest():
+    """run の結果を左右するコード (run_experiment.py) のハッシュ"""
+    with open(os.path.join(HERE, "run_experiment.py"), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def expand(cfg):
+    """grid: の直積を展開した設定のリストを返す"""
+    cfg = dict(cfg)
+    grid = cfg.pop("grid", None) or {}
+    keys = list(grid)
+    runs = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        run = {**cfg, **dict(zip(keys, values))}
+        if keys:
+            run["name"] = "__".join([cfg["name"]] + [f"{k}={v}" for k, v in zip(keys, values)])
+        runs.append(run)
+    return runs
+
+def config_hash(cfg, code):
+    return hashlib.sha256(json.dumps([cfg, code], sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def config_paths(args):
+    paths = []
+    for arg in args:
+        if os.path.isdir(arg):
+            paths += sorted(glob.glob(os.path.join(arg, "*.yaml")) + glob.glob(os.path.join(arg, "*.yml")))
+        else:
+            paths.append(arg)
+    return paths
+
+def is_done(cfg, digest, results_dir):
+    out_dir = os.path.join(results_dir, cfg["name"])
+    try:
+        with open(os.path.join(out_dir, RUN_META)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("hash") != digest:
+        return None
+    if not all(os.path.exists(os.path.join(out_dir, name)) for name in OUTPUTS):
+        return None
+    return meta
+
+def _run(cfg, digest, results_dir):
+    """ワーカー側: 1件回して run.json を書く (1プロセス1件なので ru_maxrss がそのままこの run のピーク)"""
+    import run_experiment
+
+    started = time.perf_counter()
+    run_experiment.run_config(cfg, results_dir)
+    meta = {
+        "name": cfg["name"],
+        "hash": digest,
+        "config": cfg,
+        "wall_time": time.perf_counter() - started,
+        # Linux の ru_maxrss は KiB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    # run.json を最後に書くので、途中で落ちた run は次回やり直される
+    path = os.path.join(results_dir, cfg["name"], RUN_META)
+    with open(path + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2, default=str)
+    os.replace(path + ".tmp", path)
+    return meta
+
+def sweep(paths, workers=WORKERS, results_dir=RESULTS_DIR, force=FORCE):
+    """paths の設定をすべて展開して回し、run ごとの記録 (status, wall_time, peak_rss_mb) を返す"""
+    code = code_digest()
+    runs = []
+    for path in paths:
+        with open(path) as f:
+            cfgs = expand(yaml.safe_load(f))
+        for cfg in cfgs:
+            runs.append((cfg, config_hash(cfg, code)))
+    names = [cfg["name"] for cfg, _ in runs]
+    duplicated = sorted({n for n in names if names.count(n) > 1})
+    if duplicated:
+        raise ValueError(f"duplicated run names: {duplicated}")
+
+    records = {}
+    todo = []
+    for cfg, digest in runs:
+        meta = None if force else is_done(cfg, digest, results_dir)
+        if meta is None:
+            todo.append((cfg, digest))
+        else:
+            records[cfg["name"]] = dict(meta, status="cached")
+    print(f"{len(runs)} runs: {len(runs) - len(todo)} cached, {len(todo)} to run")
+
+    if todo:
+        # ピークメモリを run ごとに測るため、ワーカーは1件ごとに作り直す
+        with ProcessPoolExecutor(max(1, min(workers, len(todo))), max_tasks_per_child=1) as pool:
+            futures = [(cfg["name"], digest, pool.submit(_run, cfg, digest, results_dir)) for cfg, digest in todo]
+            for name, digest, future in futures:
+                try:
+                    records[name] = dict(future.result(), status="ran")
+                except Exception as e:
+                    print(f"[FAILED] {name}: {e!r}")
+                    records[name] = {"name": name, "hash": digest, "status": "failed", "error": repr(e)}
+
+    records = [records[name] for name in names]
+    os.makedirs(results_dir, exist_ok=True)
+    with open(os.path.join(results_dir, "sweep.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, ["name", "hash", "status", "wall_time", "peak_rss_mb"], extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(records)
+    return records
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage: python src/sweep.py <config.yaml | config_dir> ...")
+    records = sweep(config_paths(sys.argv[1:]))
+    for r in records:
+        wall = f"{r['wall_time']:.2f}s" if "wall_time" in r else "-"
+        peak = f"{r['peak_rss_mb']:.0f}MB" if "peak_rss_mb" in r else "-"
+        print(f"{r['status']:>7} {r['name']} {wall} {peak}")
+    if any(r["status"] == "failed" for r in records):
+        sys.exit(1)
@@ -0,0 +1,118 @@
+"""sweep.py の grid 展開と、config + コードのハッシュによる run のスキップ
+
+run_experiment.py の代わりに、呼ばれた run を記録するだけの小さな run_experiment.py を
+一時ディレクトリに置いて回す (ワーカーは sys.path からそれを import する)。
+
+    cd src && python -m pytest -q test_sweep.py
+"""
+import csv
+import json
+import os
+
+import pytest
+import yaml
+
+import sweep
+
+FAKE_RUN = '''
+import os
+LOG = {log!r}
+
+def run_config(cfg, results_dir="results"):
+    if cfg.get("fail"):
+        raise RuntimeError("boom")
+    out_dir = os.path.join(results_dir, cfg["name"])
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "metrics.txt"), "w") as f:
+        f.write(f"seed={{cfg['seed']}}\\n")
+    with open(LOG, "a") as f:
+        f.write(cfg["name"] + "\\n")
+'''
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    code_dir = tmp_path / "code"
+    code_dir.mkdir()
+    log = tmp_path / "ran.log"
+    (code_dir / "run_experiment.py").write_text(FAKE_RUN.format(log=str(log)))
+    monkeypatch.setattr(sweep, "HERE", str(code_dir))
+    monkeypatch.syspath_prepend(str(code_dir))
+    configs = tmp_path / "configs"
+    configs.mkdir()
+
+    class Env:
+        results = str(tmp_path / "results")
+
+        def config(self, file, name=None, **cfg):
+            (configs / f"{file}.yaml").write_text(yaml.safe_dump({"name": name or file, **cfg}))
+
+        def sweep(self, **kw):
+            records = sweep.sweep(sweep.config_paths([str(configs)]), workers=2, results_dir=self.results, **kw)
+            return {r["name"]: r["status"] for r in records}
+
+        def ran(self):
+            runs = log.read_text().split() if log.exists() else []
+            log.unlink(missing_ok=True)
+            return sorted(runs)
+
+    return Env()
+
+def test_expand_grid():
+    runs = sweep.expand({"name": "expA", "seed": 0, "grid": {"seed": [1, 2], "projection": ["identity", "gossip"]}})
+    assert [r["name"] for r in runs] == [
+        "expA__seed=1__projection=identity", "expA__seed=1__projection=gossip",
+        "expA__seed=2__projection=identity", "expA__seed=2__projection=gossip",
+    ]
+    assert runs[3]["seed"] == 2 and runs[3]["projection"] == "gossip" and "grid" not in runs[3]
+    assert sweep.expand({"name": "expB", "seed": 0}) == [{"name": "expB", "seed": 0}]
+
+def test_second_sweep_is_cached(env):
+    env.config("expA", seed=1, grid={"projection": ["identity", "gossip"]})
+    env.config("expB", seed=2)
+    assert set(env.sweep().values()) == {"ran"}
+    assert env.ran() == ["expA__projection=gossip", "expA__projection=identity", "expB"]
+
+    meta = json.load(open(os.path.join(env.results, "expB", "run.json")))
+    assert meta["config"] == {"name": "expB", "seed": 2}
+    assert meta["wall_time"] >= 0 and meta["peak_rss_mb"] > 0
+    with open(os.path.join(env.results, "sweep.csv")) as f:
+        rows = list(csv.DictReader(f))
+    assert [r["name"] for r in rows] == ["expA__projection=identity", "expA__projection=gossip", "expB"]
+
+    assert set(env.sweep().values()) == {"cached"}
+    assert env.ran() == []
+
+def test_only_changed_runs_are_recomputed(env):
+    env.config("expA", seed=1)
+    env.config("expB", seed=2)
+    env.sweep()
+    env.ran()
+    env.config("expB", seed=3)
+    assert env.sweep() == {"expA": "cached", "expB": "ran"}
+    assert env.ran() == ["expB"]
+
+def test_missing_output_or_code_change_reruns(env):
+    env.config("expA", seed=1)
+    env.config("expB", seed=2)
+    env.sweep()
+    env.ran()
+    os.remove(os.path.join(env.results, "expA", "metrics.txt"))
+    assert env.sweep() == {"expA": "ran", "expB": "cached"}
+    env.ran()
+    with open(os.path.join(sweep.HERE, "run_experiment.py"), "a") as f:
+        f.write("# edited\n")
+    assert env.sweep() == {"expA": "ran", "expB": "ran"}
+    assert env.sweep(force=True) == {"expA": "ran", "expB": "ran"}
+
+def test_failed_run_is_recorded_and_retried(env):
+    env.config("expA", seed=1, fail=True)
+    env.config("expB", seed=2)
+    assert env.sweep() == {"expA": "failed", "expB": "ran"}
+    assert not os.path.exists(os.path.join(env.results, "expA", "run.json"))
+    assert env.sweep() == {"expA": "failed", "expB": "cached"}
+
+def test_duplicated_names_are_rejected(env):
+    env.config("expA", seed=1)
+    env.config("copy", name="expA", seed=2)
+    with pytest.raises(ValueError, match="duplicated"):
+        env.sweep()
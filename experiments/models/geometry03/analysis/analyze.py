@@ -1,28 +1,25 @@
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from sklearn.decomposition import PCA
 from sklearn.metrics import silhouette_score
 import umap
 
-print("Loading data...")
-df = pd.read_csv("experiment_data.csv")
+import os
+from relic_shared import trajectory
 
-# 1. データ整形
-nodes = df['node_index'].unique()
-steps = df['step'].unique()
-last_step = steps[-1]
+# controller が書いた .traj を優先し、無ければ CSV (初回にキャッシュを作る) から読む
+source = "experiment_data.traj" if os.path.isdir("experiment_data.traj") else "experiment_data.csv"
+print(f"Loading data from {source}...")
+data = trajectory.load(source)
 
-# Pivot for clustering analysis
-pivot = df.pivot_table(
-    index=["step","node_index"],
-    columns="dim_index",
-    values="value"
-).reset_index()
+# 1. データ整形
+# beliefs: (T, N, d), drift: (T, N) (memmap のまま、必要な部分だけ読まれる)
+beliefs = data["belief"]
+drift = data["drift"]
+nodes = trajectory.read_meta(source if os.path.isdir(source) else source + ".traj")["nodes"]
 
 # 2. ラストステップの構造解析
-final_state = pivot[pivot["step"] == last_step].copy()
-X_final = final_state.drop(columns=["step", "node_index"]).values
+X_final = beliefs[-1]
 
 # Silhouette Score Check
 # クラスタ数=2～(Node数-1)で評価してみる
@@ -44,13 +41,12 @@ print(f"Final Step Silhouette Score Estimate: {best_sil}")
 
 # (A) PCA Trajectory
 pca = PCA(n_components=2)
-all_vectors = pivot.drop(columns=["step", "node_index"]).values
+all_vectors = beliefs.reshape(-1, beliefs.shape[-1])
 pca.fit(all_vectors) # 全期間でフィット
 
 plt.figure(figsize=(10, 8))
-for n in nodes:
-    node_data = pivot[pivot["node_index"] == n]
-    coords = pca.transform(node_data.drop(columns=["step", "node_index"]).values)
+for i, n in enumerate(nodes):
+    coords = pca.transform(beliefs[:, i])
 
     # 軌跡を描画
     plt.plot(coords[:,0], coords[:,1], alpha=0.5, label=f"Node {n}")
@@ -66,9 +62,8 @@ plt.savefig("trajectory_pca.png")
 # (B) Personality Drift (Identity Crisis Graph)
 # 時間経過とともに、各ノードの人格(P)が初期値からどれだけ乖離したか
 plt.figure(figsize=(10, 6))
-drift_data = df.pivot_table(index="step", columns="node_index", values="drift")
-for n in nodes:
-    plt.plot(drift_data.index, drift_data[n], label=f"Node {n}")
+for i, n in enumerate(nodes):
+    plt.plot(np.arange(len(drift)), drift[:, i], label=f"Node {n}")
 
 plt.title("Personality Drift (Frobenius Norm from Initial P)")
 plt.xlabel("Step")
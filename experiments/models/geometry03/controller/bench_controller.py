@@ -0,0 +1,91 @@
+"""コントローラのスループット比較 (steps/sec)
+
+node/app.py を N 個ロードして1つの uvicorn から /node{i} で配信し、
+旧来の直列コントローラ (GET /state と POST /tick を1ノードずつ、待機なし) と
+非同期コントローラ (main.run) で同じステップ数を回す。
+LATENCY_MS を指定すると各リクエストの応答をその分遅らせ、コンテナ間の往復遅延を模擬する。
+
+    LATENCY_MS=5 python bench_controller.py [STEPS] [N ...]
+
+コントローラの依存に加えて requests と node/requirements.txt が必要。
+"""
+import asyncio
+import gc
+import importlib.util
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+import main
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+NODE_APP = os.path.join(HERE, "..", "node", "app.py")
+
+def build_server(n):
+    sys.path.insert(0, os.path.dirname(NODE_APP))
+    apps = {}
+    for i in range(1, n + 1):
+        os.environ["NODE_ID"] = str(i)
+        spec = importlib.util.spec_from_file_location(f"node_app_{i}", NODE_APP)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        apps[f"node{i}"] = module.app
+    latency = float(os.getenv("LATENCY_MS", "0")) / 1000
+
+    # /node{i}/... を dict で振り分ける (Mount を N 個並べると1リクエストごとに線形探索になる)
+    async def dispatch(scope, receive, send):
+        if latency:
+            await asyncio.sleep(latency)
+        name = scope["path"].split("/", 2)[1]
+        await apps[name](dict(scope, root_path="/" + name), receive, send)
+
+    # N 個のアプリ分のオブジェクトを GC の走査対象から外す (ヒープが大きいと世代2の GC が毎回重い)
+    gc.freeze()
+    return dispatch
+
+def serial_run(urls, steps):
+    """変更前の controller と同じ直列ループ (time.sleep なし)"""
+    started = time.perf_counter()
+    for step in range(steps):
+        current_beliefs = [requests.get(url + "/state").json()["belief"] for url in urls]
+        for i, url in enumerate(urls):
+            target_idx = random.choice([x for x in range(len(urls)) if x != i])
+            try:
+                requests.post(url + "/tick", json={"belief": current_beliefs[target_idx]}, timeout=1)
+            except Exception as e:
+                print(f"Error communicating {i}->{target_idx}: {e}")
+    return steps / (time.perf_counter() - started)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        import uvicorn
+        uvicorn.run(build_server(int(sys.argv[2])), port=int(sys.argv[3]), log_level="warning", lifespan="off")
+        sys.exit()
+
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    sizes = [int(a) for a in sys.argv[2:]] or [3, 30, 300]
+    print(f"LATENCY_MS={os.getenv('LATENCY_MS', '0')}")
+    print(f"{'nodes':>6} {'serial':>10} {'async':>10} {'speedup':>8}  (steps/sec)")
+    for n in sizes:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, __file__, "--serve", str(n), str(port)])
+        try:
+            urls = [f"http://127.0.0.1:{port}/node{i}" for i in range(1, n + 1)]
+            with tempfile.TemporaryDirectory() as tmp:
+                rate_async = asyncio.run(main.run(urls, steps, os.path.join(tmp, "data.traj")))
+            rate_serial = serial_run(urls, steps)
+            print(f"{n:>6} {rate_serial:10.2f} {rate_async:10.2f} {rate_async / rate_serial:7.1f}x")
+        finally:
+            server.terminate()
+            server.wait()
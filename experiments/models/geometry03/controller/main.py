@@ -1,58 +1,112 @@
-import csv, time, os, random, requests
+import asyncio, time, os, random
+import httpx
 import numpy as np
 
-node_urls = os.getenv("NODE_URLS").split(",")
+from relic_shared.trajectory import TrajectoryWriter
+
+node_urls = os.getenv("NODE_URLS", "").split(",")
 steps = int(os.getenv("STEPS", "100"))
-dim = int(os.getenv("DIM", "8"))
+# 1ステップで各ノードが話を聞く相手の数 (/tick_batch にまとめて送る)
+fanin = int(os.getenv("FANIN", "1"))
+# ステップ間の待機 (秒)。応答を待ってから次に進むので既定は 0
+step_delay = float(os.getenv("STEP_DELAY", "0"))
+output = os.getenv("OUTPUT", "/analysis/experiment_data.traj")
+# 1 にすると終了後に従来の long 形式 CSV (experiment_data.csv) も書き出す
+csv_export = os.getenv("CSV_EXPORT", "0") == "1"
+timeout = float(os.getenv("TIMEOUT", "5"))
+# 同時に投げるリクエスト数の上限 (= プールする接続数)
+concurrency = int(os.getenv("CONCURRENCY", "32"))
+
+async def limited(limit, coro):
+    async with limit:
+        return await coro
 
-def wait_for_nodes():
+async def wait_for_nodes(client, urls, limit):
     print("Waiting for nodes...")
-    ready = False
-    while not ready:
+    while True:
         try:
-            for url in node_urls:
-                requests.get(url + "/state", timeout=1)
-            ready = True
-        except:
-            time.sleep(1)
+            await asyncio.gather(*(limited(limit, client.get(url + "/state")) for url in urls))
+            break
+        except httpx.HTTPError:
+            await asyncio.sleep(1)
             print(".", end="", flush=True)
     print("Nodes ready.")
 
-wait_for_nodes()
+async def fetch_state(client, url):
+    resp = await client.get(url + "/state")
+    resp.raise_for_status()
+    return resp.json()
+
+async def tick_batch(client, url, beliefs, fallback, limit):
+    """入力をまとめて適用し、適用後の {belief, drift} を返す
+
+    失敗した場合は /state を取り直し、それも失敗したら直前の状態を使う。
+    """
+    async with limit:
+        try:
+            resp = await client.post(url + "/tick_batch", json={"beliefs": beliefs})
+            resp.raise_for_status()
+            return resp.json()
+        except httpx.HTTPError as e:
+            print(f"Error communicating with {url}: {e!r}")
+        try:
+            return await fetch_state(client, url)
+        except httpx.HTTPError:
+            return fallback
+
+async def run(urls, steps, path, fanin=1, step_delay=0.0, timeout=5.0, concurrency=32):
+    """ゴシップ実験を steps ステップ回して path (trajectory.py 形式) に書き、steps/sec を返す
+
+    各ステップで全ノードの /tick_batch を同時に投げ、その応答 (belief + drift) を
+    次のステップの状態としてそのまま使う (/state の往復は最初の1回だけ)。
+    """
+    n = len(urls)
+    concurrency = max(1, min(concurrency, n))
+    # 待ち行列は httpx のプールではなくセマフォに置く (プールに大量に積むと1リクエストあたりの CPU が増える)
+    limit = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        await wait_for_nodes(client, urls, limit)
+        print(f"Starting Gossip for {steps} steps with {n} nodes...")
 
-print(f"Starting Gossip for {steps} steps with {len(node_urls)} nodes...")
+        # 1. Get initial states (concurrently)
+        states = await asyncio.gather(*(limited(limit, fetch_state(client, url)) for url in urls))
 
-with open("/analysis/experiment_data.csv", "w", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow(["step", "node_index", "dim_index", "value", "drift"])
+        started = time.perf_counter()
+        dim = len(states[0]["belief"])
+        with TrajectoryWriter(path, nodes=range(n), columns={"belief": (dim,), "drift": ()}) as writer:
+            for step in range(steps):
+                current_beliefs = [s["belief"] for s in states]
 
-    for step in range(steps):
-        # 1. Get current states
-        current_beliefs = []
-        for i, url in enumerate(node_urls):
-            resp = requests.get(url + "/state").json()
-            belief = resp["belief"]
-            drift = resp["drift"]
+                # Log data
+                writer.append(belief=current_beliefs, drift=[s["drift"] for s in states])
 
-            # Log data
-            for d, v in enumerate(belief):
-                writer.writerow([step, i, d, v, drift])
-            current_beliefs.append(belief)
+                # 2. Interaction (Random Gossip)
+                # 各ノードがランダムな相手を選んで話を聞く (全ノード同時)
+                batches = []
+                for i in range(n):
+                    others = [x for x in range(n) if x != i]
+                    targets = random.sample(others, min(fanin, len(others)))
+                    batches.append([current_beliefs[t] for t in targets])
 
-        # 2. Interaction (Random Gossip)
-        # 各ノードがランダムな相手を選んで話を聞く
-        for i, url in enumerate(node_urls):
-            target_idx = random.choice([x for x in range(len(node_urls)) if x != i])
-            target_belief = current_beliefs[target_idx]
+                states = await asyncio.gather(*(
+                    tick_batch(client, url, beliefs, states[i], limit)
+                    for i, (url, beliefs) in enumerate(zip(urls, batches))
+                ))
 
-            try:
-                requests.post(url + "/tick", json={"belief": target_belief}, timeout=1)
-            except Exception as e:
-                print(f"Error communicating {i}->{target_idx}: {e}")
+                if step % 10 == 0:
+                    print(f"Step {step}/{steps} completed")
 
-        if step % 10 == 0:
-            print(f"Step {step}/{steps} completed")
+                if step_delay:
+                    await asyncio.sleep(step_delay)
 
-        time.sleep(0.05) # 少し待機
+        elapsed = time.perf_counter() - started
+    rate = steps / elapsed if elapsed > 0 else float("inf")
+    print(f"Experiment completed. {rate:.1f} steps/sec")
+    return rate
 
-print("Experiment completed.")
+if __name__ == "__main__":
+    asyncio.run(run(node_urls, steps, output, fanin, step_delay, timeout, concurrency))
+    if csv_export:
+        from relic_shared.trajectory import to_csv
+        to_csv(output, os.path.splitext(output)[0] + ".csv", header=("step", "node_index", "dim_index", "value"))
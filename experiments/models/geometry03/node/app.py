@@ -3,11 +3,18 @@ from pydantic import BaseModel
 import numpy as np
 import os
 
+from ortho import Orthogonalizer, orthogonality_error
+
 app = FastAPI()
 
 DIM = int(os.getenv("DIM", "8"))
 LR = float(os.getenv("LR", "0.05")) # Hebbian learning rate
 ALPHA = float(os.getenv("ALPHA", "0.6"))
+# 再直交化の戦略: svd | newton | cayley | periodic (ortho.py 参照)
+ORTHO = os.getenv("ORTHO", "svd")
+ORTHO_EVERY = int(os.getenv("ORTHO_EVERY", "10")) # periodic: 何 tick ごとに射影するか
+NS_ITERS = int(os.getenv("NS_ITERS", "2"))        # newton: 反復回数
+orthogonalizer = Orthogonalizer(ORTHO, ORTHO_EVERY, NS_ITERS)
 
 seed = int(os.getenv("NODE_ID", "1"))
 rng = np.random.default_rng(seed)
@@ -27,14 +34,13 @@ class InputData(BaseModel):
 
 @app.get("/state")
 def state():
-    # 現在のベクトルと、初期人格からの乖離度(Drift)を返す
+    # 現在のベクトルと、初期人格からの乖離度(Drift)、直交性の誤差 ||P^T P - I||_F を返す
     drift = np.linalg.norm(P - P_initial, ord='fro')
-    return {"belief": x.tolist(), "drift": float(drift)}
+    return {"belief": x.tolist(), "drift": float(drift),
+            "ortho": ORTHO, "ortho_error": orthogonality_error(P)}
 
-@app.post("/tick")
-def tick(data: InputData):
+def apply_input(incoming):
     global x, P
-    incoming = np.array(data.belief)
 
     # 1. Interpretation with Non-linearity
     # 相手の言葉(incoming)を自分の人格(P)で解釈し、tanhで特徴を尖らせる
@@ -46,14 +52,24 @@ def tick(data: InputData):
 
     # 3. Hebbian Learning of Persona (The Experiment E Core)
     # 「この入力(incoming)は、こういう解釈(new_x)になるべきだったんだな」とPを更新
-    # update = outer(output, input)
-    delta_P = np.outer(new_x, incoming)
-    P_temp = P + LR * delta_P
-
     # 4. Orthogonalization (人格の崩壊を防ぐ / 拘束条件)
-    # これにより、Pは常に「回転」または「反射」であり続ける
-    U_p, _, Vt_p = np.linalg.svd(P_temp)
-    P = U_p @ Vt_p
+    # これにより、Pは常に「回転」または「反射」であり続ける (戦略は ORTHO で選ぶ)
+    P = orthogonalizer.update(P, new_x, incoming, LR)
 
     x = new_x
+
+@app.post("/tick")
+def tick(data: InputData):
+    apply_input(np.array(data.belief))
     return {"belief": x.tolist()}
+
+class BatchInput(BaseModel):
+    beliefs: list[list[float]]
+
+@app.post("/tick_batch")
+def tick_batch(data: BatchInput):
+    # キューに溜まった入力を順に適用し、/state を別に叩かなくて済むよう belief と drift をまとめて返す
+    for belief in data.beliefs:
+        apply_input(np.array(belief))
+    drift = np.linalg.norm(P - P_initial, ord='fro')
+    return {"belief": x.tolist(), "drift": float(drift)}
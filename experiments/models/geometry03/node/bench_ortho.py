@@ -0,0 +1,53 @@
+"""再直交化戦略の比較ベンチマーク
+
+同じ入力列で node の tick (解釈 → 状態更新 → Hebbian + 再直交化) を回し、戦略ごとに
+1 tick の時間、直交性誤差 ||P^T P - I||_F、Drift ||P - P_initial||_F と、
+毎 tick SVD で射影した場合の P からのずれを表示する。
+
+    python bench_ortho.py [DIM] [TICKS]
+"""
+import sys
+import time
+import numpy as np
+
+from ortho import STRATEGIES, Orthogonalizer, orthogonality_error, svd_project
+
+LR = 0.05
+ALPHA = 0.6
+
+def run(strategy, P0, x0, inputs):
+    orthogonalizer = Orthogonalizer(strategy)
+    P, x = P0.copy(), x0.copy()
+    trajectory = []
+    elapsed = 0.0
+    for incoming in inputs:
+        interpretation = np.tanh(P @ incoming)
+        raw_new_x = ALPHA * x + (1 - ALPHA) * interpretation
+        new_x = raw_new_x / (np.linalg.norm(raw_new_x) + 1e-9)
+        t0 = time.perf_counter()
+        P = orthogonalizer.update(P, new_x, incoming, LR)
+        elapsed += time.perf_counter() - t0
+        x = new_x
+        trajectory.append(P)
+    return elapsed / len(inputs), trajectory
+
+if __name__ == "__main__":
+    dim = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = np.random.default_rng(0)
+    P0 = svd_project(rng.normal(size=(dim, dim)))
+    x0 = rng.normal(size=dim)
+    x0 /= np.linalg.norm(x0)
+    inputs = rng.normal(size=(ticks, dim))
+    inputs /= np.linalg.norm(inputs, axis=1, keepdims=True)
+
+    results = {s: run(s, P0, x0, inputs) for s in STRATEGIES}
+    base_time, reference = results["svd"]
+
+    print(f"dim={dim} ticks={ticks}")
+    print(f"{'strategy':>9} {'ms/tick':>9} {'speedup':>8} {'ortho_err_max':>14} {'drift':>8} {'gap_vs_svd':>11}")
+    for s, (sec, trajectory) in results.items():
+        err = max(orthogonality_error(P) for P in trajectory)
+        drift = np.linalg.norm(trajectory[-1] - P0, ord="fro")
+        gap = max(np.linalg.norm(P - R, ord="fro") for P, R in zip(trajectory, reference))
+        print(f"{s:>9} {sec * 1e3:9.3f} {base_time / sec:7.1f}x {err:14.2e} {drift:8.4f} {gap:11.2e}")
@@ -0,0 +1,72 @@
+"""人格行列 P の再直交化戦略
+
+Hebbian 更新 P + LR * outer(new_x, incoming) の後、P を直交群に戻す方法を選ぶ。
+
+- svd:      毎 tick 厳密な極分解 (SVD) で射影する。O(d^3)、最も正確
+- newton:   Newton–Schulz 極分解反復 X <- X (3I - X^T X) / 2 を前回の P から warm start。
+            行列積のみ (SVD より大幅に安い)。反復回数は NS_ITERS
+- cayley:   Hebbian 勾配を接空間に射影した歪対称行列 A = u w^T - w u^T (w = P incoming) の
+            Cayley 変換 (I - t A)^-1 (I + t A) P で更新する。構成上直交のまま。
+            A はランク2 なので Woodbury で O(d^2)
+- periodic: 加法更新のまま進め、ORTHO_EVERY tick ごとに SVD で射影する
+
+どの戦略が「直交性誤差」と「厳密射影からのずれ」をどれだけ生むかは bench_ortho.py で測る。
+"""
+import numpy as np
+
+STRATEGIES = ("svd", "newton", "cayley", "periodic")
+
+def svd_project(P):
+    """P に最も近い直交行列 (極分解の直交因子)"""
+    U, _, Vt = np.linalg.svd(P)
+    return U @ Vt
+
+def newton_schulz(X, iters=2):
+    """直交行列に近い X (特異値が (0, sqrt(3)) 内) を極分解の直交因子に収束させる"""
+    I3 = 3.0 * np.eye(X.shape[0])
+    for _ in range(iters):
+        X = 0.5 * X @ (I3 - X.T @ X)
+    return X
+
+def cayley_update(P, u, incoming, lr):
+    """P を歪対称行列 A = u w^T - w u^T (w = P incoming) の Cayley 変換で回す
+
+    (I - t A)^-1 (I + t A) P, t = lr / 4。一次近似で P + lr/2 (G - P G^T P) (G = outer(u, incoming))
+    となり、P + lr G を SVD で射影した結果と一次まで一致する。
+    A = L R^T (L = [u, w], R = [w, -u]) として Woodbury で 2x2 の solve だけにする。
+    """
+    w = P @ incoming
+    L = np.stack([u, w], axis=1)
+    R = np.stack([w, -u], axis=1)
+    t = 0.25 * lr
+    Y = P + t * L @ (R.T @ P)
+    M = np.eye(2) - t * (R.T @ L)
+    return Y + t * L @ np.linalg.solve(M, R.T @ Y)
+
+def orthogonality_error(P):
+    """||P^T P - I||_F"""
+    return float(np.linalg.norm(P.T @ P - np.eye(P.shape[0]), ord="fro"))
+
+class Orthogonalizer:
+    """1 tick 分の Hebbian 更新と、選んだ戦略での再直交化を行う"""
+
+    def __init__(self, strategy="svd", every=10, ns_iters=2):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown ORTHO strategy '{strategy}' (expected one of {STRATEGIES})")
+        self.strategy = strategy
+        self.every = max(1, every)
+        self.ns_iters = ns_iters
+        self.ticks = 0
+
+    def update(self, P, new_x, incoming, lr):
+        self.ticks += 1
+        if self.strategy == "cayley":
+            return cayley_update(P, new_x, incoming, lr)
+
+        # update = outer(output, input)
+        P_temp = P + lr * np.outer(new_x, incoming)
+        if self.strategy == "newton":
+            return newton_schulz(P_temp, self.ns_iters)
+        if self.strategy == "periodic" and self.ticks % self.every:
+            return P_temp
+        return svd_project(P_temp)
@@ -1,17 +1,104 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
+from sklearn.metrics import pairwise_distances, silhouette_score
 
-def compute_silhouette(df):
-    out = []
+# SILHOUETTE: exact | sampled | simplified | auto (N <= EXACT_MAX_N なら exact, それ以外は sampled)
+METHOD = os.getenv("SILHOUETTE", "auto")
+SAMPLE_SIZE = int(os.getenv("SILHOUETTE_SAMPLE", "1000"))
+EXACT_MAX_N = 2000
+WORKERS = int(os.getenv("METRIC_WORKERS", "0")) or os.cpu_count()
+
+def sampled_silhouette(X, labels, sample_size=SAMPLE_SIZE, seed=0):
+    """sample_size 点の silhouette を全点との距離で求めた平均と、その 95% 信頼区間の半幅
+
+    各点の値は厳密な silhouette と同じ定義なので推定は不偏 (O(sample_size * N))。
+    """
+    n = len(X)
+    m = min(sample_size, n)
+    idx = np.random.default_rng(seed).choice(n, m, replace=False)
+    k = labels.max() + 1
+    onehot = np.eye(k)[labels]
+    counts = onehot.sum(axis=0)
+
+    D = pairwise_distances(X[idx], X)
+    sums = D @ onehot                       # (m, k) 各クラスタまでの距離の和
+    own = labels[idx]
+    rows = np.arange(m)
+    a = sums[rows, own] / np.maximum(counts[own] - 1, 1)
+    mean_other = sums / np.maximum(counts, 1)
+    mean_other[rows, own] = np.inf
+    mean_other[:, counts == 0] = np.inf
+    b = mean_other.min(axis=1)
+    s = np.where(counts[own] > 1, (b - a) / np.maximum(np.maximum(a, b), 1e-12), 0.0)
+
+    # 有限母集団補正つきの標準誤差
+    err = 1.96 * s.std(ddof=1) / np.sqrt(m) * np.sqrt(1 - m / n) if m > 1 else np.nan
+    return float(s.mean()), float(err)
+
+def simplified_silhouette(X, labels, centers):
+    """重心ベースの silhouette: a = 自クラスタ重心まで, b = 最も近い他クラスタ重心まで (O(N k))"""
+    D = pairwise_distances(X, centers)
+    rows = np.arange(len(X))
+    a = D[rows, labels]
+    D[rows, labels] = np.inf
+    b = D.min(axis=1)
+    return float(np.mean((b - a) / np.maximum(np.maximum(a, b), 1e-12)))
+
+def _score(args):
+    t, X, labels, centers, method = args
+    if method == "exact":
+        return silhouette_score(X, labels), 0.0
+    if method == "simplified":
+        return simplified_silhouette(X, labels, centers), np.nan
+    return sampled_silhouette(X, labels, seed=t)
+
+def compute_silhouette(df, method=None, workers=None, k=2):
+    """時刻ごとのクラスタリング品質を output/silhouette_time.csv (t, silhouette) に書く
+
+    KMeans は前の時刻の重心から warm start して逐次に回し (1回の fit が数反復で済む)、
+    重い silhouette の計算だけを時刻ごとにプロセスプールで並列化する。
+    sampled の場合は信頼区間の半幅を output/silhouette_time_bounds.csv にも書く。
+    """
+    method = method or METHOD
+    workers = workers or WORKERS
+    cols = [c for c in df.columns if c.startswith("x")]
+
+    tasks = []
+    times = []
+    centers = None
     for t, g in df.groupby("t"):
-        X = g[[c for c in g.columns if c.startswith("x")]].values
+        X = g[cols].values
+        times.append(t)
         if len(X) < 5:
-            s = np.nan
+            tasks.append(None)
+            centers = None
+            continue
+        if centers is None:
+            km = KMeans(n_clusters=k, n_init="auto", random_state=0).fit(X)
         else:
-            k = 2
-            labels = KMeans(n_clusters=k, n_init="auto").fit_predict(X)
-            s = silhouette_score(X, labels)
-        out.append({"t": t, "silhouette": s})
-    pd.DataFrame(out).to_csv("output/silhouette_time.csv", index=False)
+            km = KMeans(n_clusters=k, init=centers, n_init=1).fit(X)
+        centers = km.cluster_centers_
+        labels = km.labels_
+        m = method if method != "auto" else ("exact" if len(X) <= EXACT_MAX_N else "sampled")
+        tasks.append((t, X, labels, centers, m) if len(set(labels)) > 1 else None)
+
+    todo = [task for task in tasks if task is not None]
+    if workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            results = iter(list(pool.map(_score, todo, chunksize=max(1, len(todo) // (4 * workers)))))
+    else:
+        results = map(_score, todo)
+
+    out = []
+    for t, task in zip(times, tasks):
+        s, err = next(results) if task is not None else (np.nan, np.nan)
+        out.append({"t": t, "silhouette": s, "silhouette_err": err})
+    out = pd.DataFrame(out)
+    out[["t", "silhouette"]].to_csv("output/silhouette_time.csv", index=False)
+    if out["silhouette_err"].gt(0).any():
+        out.to_csv("output/silhouette_time_bounds.csv", index=False)
+    return out
@@ -1,32 +1,76 @@
+import os
+
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
-
-np.random.seed(0)
 
 N = 30
 D = 5
 T = 50
 alpha = 0.5
 
-belief = np.random.randn(N, D)
-records = []
+# ENSEMBLE=1 のときは SEEDS 個のシード x ALPHAS の全組み合わせを1本の配列で同時に進め、
+# output/ensemble.npz (seed, alpha, belief[S, A, T, N, D]) に書く
+ensemble = os.getenv("ENSEMBLE", "0") == "1"
+SEEDS = int(os.getenv("SEEDS", "100"))
+ALPHAS = os.getenv("ALPHAS", "0.05:0.95:10")  # start:stop:num (linspace) またはカンマ区切り
+
+def parse_alphas(spec):
+    if ":" in spec:
+        start, stop, num = spec.split(":")
+        return np.linspace(float(start), float(stop), int(num))
+    return np.array([float(a) for a in spec.split(",")])
+
+def initial_beliefs(seeds, N, D):
+    """シードごとの初期信念 (S, N, D)。seed=s は np.random.seed(s) + randn(N, D) と同じ値"""
+    belief = np.empty((len(seeds), N, D))
+    for k, s in enumerate(seeds):
+        belief[k] = np.random.RandomState(s).randn(N, D)
+    return belief
+
+def simulate(belief0, alphas, T):
+    """(S, N, D) の初期信念を alphas の各値で T ステップ進めた (S, A, T, N, D) を返す
+
+    全組み合わせを先頭のバッチ軸に並べ、1ステップを配列演算1回分で更新する。
+    出力と作業領域は最初に確保し、ループ内では in-place でしか書かない。
+    """
+    S, N, D = belief0.shape
+    A = len(alphas)
+    out = np.empty((S, A, T, N, D))
+    belief = np.repeat(belief0[:, None], A, axis=1)         # (S, A, N, D)
+    a = np.asarray(alphas, dtype=float)[None, :, None, None]
+    mean = np.empty((S, A, 1, D))
+    delta = np.empty_like(belief)
+
+    for t in range(T):
+        belief.mean(axis=2, keepdims=True, out=mean)
+        np.subtract(mean, belief, out=delta)
+        delta *= a
+        belief += delta
+        out[:, :, t] = belief
+    return out
 
-for t in range(T):
-    mean = belief.mean(axis=0)
-    belief = belief + alpha * (mean - belief)
-    for i in range(N):
-        records.append({
-            "t": t,
-            "agent": i,
-            **{f"x{d}": belief[i, d] for d in range(D)}
-        })
+def to_frame(traj):
+    """(T, N, D) を long 形式の DataFrame (t, agent, x0..) にする"""
+    T, N, D = traj.shape
+    columns = {"t": np.repeat(np.arange(T), N), "agent": np.tile(np.arange(N), T)}
+    X = traj.reshape(T * N, D)
+    columns.update({f"x{d}": X[:, d] for d in range(D)})
+    return pd.DataFrame(columns)
 
-df = pd.DataFrame(records)
-df.to_csv("output/belief.csv", index=False)
+if __name__ == "__main__":
+    if ensemble:
+        seeds = np.arange(SEEDS)
+        alphas = parse_alphas(ALPHAS)
+        belief = simulate(initial_beliefs(seeds, N, D), alphas, T)
+        np.savez("output/ensemble.npz", seed=seeds, alpha=alphas, belief=belief)
+        print(f"ensemble: {len(seeds)} seeds x {len(alphas)} alphas -> output/ensemble.npz")
+    else:
+        belief = simulate(initial_beliefs([0], N, D), [alpha], T)[0, 0]
+        df = to_frame(belief)
+        df.to_csv("output/belief.csv", index=False)
 
-from metrics import compute_silhouette
-compute_silhouette(df)
+        from metrics import compute_silhouette
+        compute_silhouette(df)
 
-from visualize import visualize
-visualize(df)
+        from visualize import visualize
+        visualize(df)
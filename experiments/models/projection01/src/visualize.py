@@ -1,7 +1,8 @@
 import pandas as pd
 import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
-import umap
+from relic_shared import embedding
+
+CACHE_DIR = "output/.embed_cache"
 
 def visualize(df):
     sil = pd.read_csv("output/silhouette_time.csv")
@@ -15,16 +16,14 @@ def visualize(df):
     last = df[df["t"] == df["t"].max()]
     X = last[[c for c in last.columns if c.startswith("x")]].values
 
-    pca = PCA(n_components=2)
-    Xp = pca.fit_transform(X)
+    Xp = embedding.pca(X, cache_dir=CACHE_DIR)
 
     plt.figure()
     plt.scatter(Xp[:,0], Xp[:,1])
     plt.title("belief PCA")
     plt.savefig("output/belief_pca.png")
 
-    reducer = umap.UMAP()
-    Xu = reducer.fit_transform(X)
+    Xu = embedding.umap(X, cache_dir=CACHE_DIR)
 
     plt.figure()
     plt.scatter(Xu[:,0], Xu[:,1])
@@ -1,14 +1,20 @@
+import os
+from contextlib import ExitStack
 import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
-from sklearn.decomposition import PCA
-import umap
+from relic_shared import embedding
+# projection02 は alpha = 0 の rfpg に相当するので、geometry01 と同じ CSR バッチ実装を使う
+from relic_shared.rfpg import to_csr, rfpg_step_csr
+from relic_shared.sharded import ShardedRunner
 
 np.random.seed(0)
 
 N = 20
 d = 8
 T = 50
+engine = os.getenv("ENGINE", "csr")  # csr (batched) | sharded (multi-core) | loop (reference)
+workers = int(os.getenv("WORKERS", "0")) or None
 
 # random graph
 neighbors = {i: list(np.random.choice(N, 3, replace=False)) for i in range(N)}
@@ -20,29 +26,49 @@ X = X / np.linalg.norm(X, axis=1, keepdims=True)
 # personalities (orthogonal)
 P = np.array([np.linalg.qr(np.random.randn(d, d))[0] for _ in range(N)])
 
-history = []
-
-for t in range(T):
+def loop_step(X):
     X_new = np.zeros_like(X)
     for i in range(N):
         agg = sum(P[i] @ X[j] for j in neighbors[i])
         X_new[i] = agg / np.linalg.norm(agg)
-    X = X_new
-    norms = np.linalg.norm(X, axis=1)
-    history.append(norms)
+    return X_new
+
+history = []
+
+# sharded の共有メモリとワーカーは、例外で抜けた場合も含めて with を出るときに解放する
+with ExitStack() as stack:
+    if engine == "csr":
+        A = to_csr([neighbors[i] for i in range(N)])
+        step = lambda X: rfpg_step_csr(X, P, A, 0.0)
+    elif engine == "sharded":
+        runner = stack.enter_context(ShardedRunner(X, P, to_csr([neighbors[i] for i in range(N)]), 0.0, workers))
+        step = lambda X: runner.step()
+    elif engine == "loop":
+        step = loop_step
+    else:
+        raise ValueError(f"unknown ENGINE: {engine}")
+
+    for t in range(T):
+        X = step(X)
+        norms = np.linalg.norm(X, axis=1)
+        history.append(norms)
+
+    # sharded の X は共有バッファのビューなので、解放する前にコピーする
+    X = np.array(X)
 
 history = np.array(history)
 pd.DataFrame(history).to_csv("output/norms.csv", index=False)
 
 # PCA
-X_pca = PCA(2).fit_transform(X)
+CACHE_DIR = "output/.embed_cache"
+X_pca = embedding.pca(X, cache_dir=CACHE_DIR)
 plt.scatter(X_pca[:,0], X_pca[:,1])
 plt.title("PCA (final state)")
 plt.savefig("output/pca.png")
 plt.close()
 
 # UMAP
-X_umap = umap.UMAP(n_neighbors=5, min_dist=0.3).fit_transform(X)
+X_umap = embedding.umap(X, n_neighbors=5, min_dist=0.3, cache_dir=CACHE_DIR)
 plt.scatter(X_umap[:,0], X_umap[:,1])
 plt.title("UMAP (final state)")
 plt.savefig("output/umap.png")
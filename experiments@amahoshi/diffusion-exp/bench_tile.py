@@ -0,0 +1,56 @@
+"""タイル拡散ステップの比較 (step/sec)
+
+変更前の run.py と同じループ (タイルごとに tile.step で np.pad + 一時配列、毎ステップ new_tiles を確保) と
+TileGrid (ゴーストセル付き前後2面バッファ) で同じ初期条件を回し、結果が一致することも確かめる。
+
+    python bench_tile.py [STEPS] [GRID_SIZE ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from config import TILES_X, TILES_Y, ALPHA
+from tile import TileGrid, step
+
+def reference(grid_size, steps):
+    tile_w, tile_h = grid_size // TILES_X, grid_size // TILES_Y
+    tiles = [[np.zeros((tile_h, tile_w)) for _ in range(TILES_X)] for _ in range(TILES_Y)]
+    c = grid_size // 2
+    tiles[c // tile_h][c // tile_w][c % tile_h, c % tile_w] = 100.0
+
+    started = time.perf_counter()
+    for _ in range(steps):
+        new_tiles = [[None]*TILES_X for _ in range(TILES_Y)]
+        for y in range(TILES_Y):
+            for x in range(TILES_X):
+                north = tiles[y-1][x][-1,:] if y > 0 else None
+                south = tiles[y+1][x][0,:] if y < TILES_Y-1 else None
+                west  = tiles[y][x-1][:,-1] if x > 0 else None
+                east  = tiles[y][x+1][:,0] if x < TILES_X-1 else None
+                new_tiles[y][x] = step(tiles[y][x], north, south, west, east, ALPHA)
+        tiles = new_tiles
+    elapsed = time.perf_counter() - started
+    return steps / elapsed, np.block(tiles)
+
+def buffered(grid_size, steps):
+    tile_w, tile_h = grid_size // TILES_X, grid_size // TILES_Y
+    tiles = TileGrid(TILES_Y, TILES_X, tile_h, tile_w, ALPHA)
+    c = grid_size // 2
+    tiles.tile(c // tile_h, c // tile_w)[c % tile_h, c % tile_w] = 100.0
+
+    started = time.perf_counter()
+    for _ in range(steps):
+        tiles.step()
+    elapsed = time.perf_counter() - started
+    return steps / elapsed, tiles.gather()
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    sizes = [int(a) for a in sys.argv[2:]] or [100, 1024, 4096]
+    print(f"{'grid':>6} {'reference':>10} {'buffered':>10} {'speedup':>8}  (steps/sec, {TILES_Y}x{TILES_X} tiles)")
+    for n in sizes:
+        rate_ref, ref = reference(n, steps)
+        rate_buf, buf = buffered(n, steps)
+        assert np.array_equal(ref, buf), "results differ"
+        print(f"{n:>6} {rate_ref:10.1f} {rate_buf:10.1f} {rate_buf / rate_ref:7.1f}x")
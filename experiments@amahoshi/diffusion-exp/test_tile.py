@@ -0,0 +1,46 @@
+"""TileGrid が tile.step を毎ステップ呼ぶ参照実装とビット単位で一致することの確認
+
+    python -m pytest -q test_tile.py
+"""
+import numpy as np
+import pytest
+
+from tile import TileGrid, step
+
+def reference(tiles, alpha, steps):
+    ty, tx = len(tiles), len(tiles[0])
+    for _ in range(steps):
+        new_tiles = [[None] * tx for _ in range(ty)]
+        for y in range(ty):
+            for x in range(tx):
+                north = tiles[y-1][x][-1, :] if y > 0 else None
+                south = tiles[y+1][x][0, :] if y < ty - 1 else None
+                west = tiles[y][x-1][:, -1] if x > 0 else None
+                east = tiles[y][x+1][:, 0] if x < tx - 1 else None
+                new_tiles[y][x] = step(tiles[y][x], north, south, west, east, alpha)
+        tiles = new_tiles
+    return np.block(tiles)
+
+@pytest.mark.parametrize("tiles_y, tiles_x, tile_h, tile_w, block", [
+    (4, 4, 25, 25, 16384),
+    (2, 3, 7, 5, 16384),
+    (3, 2, 9, 11, 13),    # block が行の途中で切れる
+    (1, 1, 6, 6, 16384),  # 隣が無い (全辺がグリッド外周)
+])
+def test_matches_reference(tiles_y, tiles_x, tile_h, tile_w, block):
+    rng = np.random.default_rng(0)
+    init = [[rng.random((tile_h, tile_w)) for _ in range(tiles_x)] for _ in range(tiles_y)]
+    grid = TileGrid(tiles_y, tiles_x, tile_h, tile_w, 0.15, block=block)
+    for y in range(tiles_y):
+        for x in range(tiles_x):
+            grid.tile(y, x)[...] = init[y][x]
+    for _ in range(30):
+        grid.step()
+    assert np.array_equal(grid.gather(), reference(init, 0.15, 30))
+
+def test_gather_into_existing_buffer():
+    grid = TileGrid(2, 2, 3, 4, 0.1)
+    grid.tile(1, 0)[2, 3] = 1.0
+    out = np.full((6, 8), np.nan)
+    assert grid.gather(out) is out
+    assert out[5, 3] == 1.0 and np.nansum(out) == 1.0
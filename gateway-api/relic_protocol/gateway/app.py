@@ -1,11 +1,70 @@
 from flask import Flask, jsonify, request
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
 import requests
+import hashlib
+import random
+import threading
+import time
 import os
 import json
 
 app = Flask(__name__)
 
 NODES = os.getenv("NODES", "").split(",")
+DEPLOY_TIMEOUT = float(os.getenv("DEPLOY_TIMEOUT", "1.0"))  # /deploy 全体の締め切り (秒)
+STATUS_TIMEOUT = float(os.getenv("STATUS_TIMEOUT", "0.5"))  # /status 全体の締め切り (秒)
+STATUS_MAX_AGE = float(os.getenv("STATUS_MAX_AGE", "10.0")) # キャッシュをそのまま返してよい最大経過秒数
+STATUS_PULL_INTERVAL = float(os.getenv("STATUS_PULL_INTERVAL", "5.0"))  # 同じノードへ直接問い合わせる最小間隔 (秒)
+
+# 全ノード共通の keep-alive 接続プールと、同時送信用のスレッドプール
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", str(min(max(len(NODES), 1), 256))))
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=max(len(NODES), 1), pool_maxsize=FANOUT_WORKERS))
+executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS)
+
+def _call_node(node, method, path, timeout, payload=None):
+    start = time.perf_counter()
+    try:
+        resp = session.request(method, f"http://{node}:8000{path}", json=payload, timeout=timeout)
+        body = resp.json()
+    except Exception:
+        body = None
+    if not isinstance(body, dict):
+        # 呼び出し側は {**body, ...} で結果に混ぜるので、オブジェクト以外の応答は失敗扱い
+        body = None
+    return body, round((time.perf_counter() - start) * 1000, 1)
+
+def fan_out(method, path, timeout, payload=None, nodes=None):
+    """全ノードへ同時にリクエストし、締め切りまでに返ってきた分を返す
+
+    戻り値は NODES 順の (node, body, latency_ms) のリスト。
+    失敗したノードは body=None、締め切りに間に合わなかったノードは latency_ms=None。
+    """
+    nodes = NODES if nodes is None else nodes
+    futures = {
+        executor.submit(_call_node, node, method, path, timeout, payload): node
+        for node in nodes
+    }
+    wait(futures, timeout=timeout)
+    results = {}
+    for future, node in futures.items():
+        if future.done():
+            results[node] = future.result()
+        else:
+            future.cancel()
+            results[node] = (None, None)
+    return [(node, *results[node]) for node in nodes]
+
+# --- State Cache ---
+# ノードから push された最新状態 (node -> {"state": ..., "last_seen": unix time})
+# ノードの NODE_ID は NODES のホスト名と一致している前提
+state_cache = {}
+state_cache_lock = threading.Lock()
+
+def cache_state(node, state):
+    with state_cache_lock:
+        state_cache[node] = {"state": state, "last_seen": time.time()}
 
 @app.route('/')
 def index():
@@ -13,39 +72,144 @@ def index():
         "system": "Internet 2 Gateway",
         "nodes_online": NODES,
         "usage": {
-            "POST /deploy": "Deploy a Relic to all nodes",
-            "GET /status": "Get network belief state"
+            "POST /deploy": "Seed a versioned Relic into the network (?broadcast=1 to push to every node)",
+            "GET /rollout": "Relic rollout progress",
+            "GET /status": "Get network belief state",
+            "POST /report": "Push endpoint for node state updates"
         }
     })
 
+# --- Relic Rollout ---
+# 最後に配布した Relic (version は単調増加、gossip で伝播する)
+rollout = {"version": 0, "hash": None, "seed": None, "started_at": None}
+rollout_lock = threading.Lock()
+
+def next_relic_version():
+    # ミリ秒時刻を使い、Gateway が再起動しても単調増加になるようにする
+    return max(rollout["version"] + 1, time.time_ns() // 1_000_000)
+
 @app.route('/deploy', methods=['POST'])
 def deploy_relic():
-    """全ノードにRelicを一斉送信（または伝播の起点を作成）"""
-    data = request.json
-    results = {}
+    """Relicにバージョンを付けて1ノードに注入し、Gossipで全体へ広める"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("code"), str):
+        return jsonify({"error": "body must be a JSON object with a string 'code'"}), 400
+    data = dict(data)
+    code_hash = hashlib.sha256(data["code"].encode()).hexdigest()
+    with rollout_lock:
+        data["version"] = next_relic_version()
+        rollout.update(version=data["version"], hash=code_hash, seed=None, started_at=time.time())
 
-    # 実際の運用では1つのノードに投げてGossipで広めるのが筋だが、
-    # MVPとしては一斉配信で「世界の上書き」を行う
-    for node in NODES:
-        try:
-            resp = requests.post(f"http://{node}:8000/inject_relic", json=data, timeout=1)
-            results[node] = resp.json()
-        except:
-            results[node] = "offline"
+    if request.args.get("broadcast"):
+        # 旧来の一斉配信 (全ノードを即座に上書きする)
+        results = {}
+        for node, body, latency in fan_out("POST", "/inject_relic", DEPLOY_TIMEOUT, data):
+            if body is None:
+                results[node] = {"status": "offline" if latency is not None else "timeout", "latency_ms": latency}
+            else:
+                results[node] = {**body, "latency_ms": latency}
+        return jsonify(results)
 
-    return jsonify(results)
+    # 生きているノードが見つかるまでランダムな順に試す (通常は1回で済む)
+    # 全体で DEPLOY_TIMEOUT を超えないよう、各ノードには残り時間だけを渡す
+    deadline = time.monotonic() + DEPLOY_TIMEOUT
+    for node in random.sample(NODES, k=len(NODES)):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        body, latency = _call_node(node, "POST", "/inject_relic", remaining, data)
+        if body is not None:
+            with rollout_lock:
+                # 応答待ちの間に次の /deploy が来ていたら、そちらの記録を上書きしない
+                if rollout["version"] == data["version"]:
+                    rollout["seed"] = node
+            return jsonify({"seed": node, "version": data["version"], "hash": code_hash,
+                            "latency_ms": latency, "result": body})
+
+    return jsonify({"status": "no node reachable", "version": data["version"]}), 503
+
+@app.route('/rollout')
+def rollout_status():
+    """最新 Relic がどこまで伝播したか"""
+    states = collect_states()
+    with rollout_lock:
+        current = dict(rollout)
+    versions = {s["node"]: s.get("relic_version") for s in states}
+    converged = [n for n, v in versions.items() if v is not None and v >= current["version"]]
+    started = current["started_at"]
+    return jsonify({
+        **current,
+        "elapsed_s": None if started is None else round(time.time() - started, 3),
+        "converged": len(converged),
+        "total": len(NODES),
+        "nodes": versions,
+    })
+
+@app.route('/report', methods=['POST'])
+def report():
+    """ノードからの状態 push を受け取りキャッシュする"""
+    state = request.get_json(silent=True)
+    if not isinstance(state, dict) or not isinstance(state.get("node"), str):
+        return jsonify({"error": "body must be a JSON object with a string 'node'"}), 400
+    if state["node"] not in NODES:
+        return jsonify({"error": f"unknown node {state['node']!r}"}), 400
+    cache_state(state["node"], state)
+    return jsonify({"status": "ok"})
+
+# 古い・未到着のノードへの直接問い合わせの記録 (node -> {"at": unix time, "failure": 失敗時の結果 or None})
+# 落ちているノードに /status のたびに問い合わせないよう、同じノードへは STATUS_PULL_INTERVAL 秒に1回まで
+last_pull = {}
+
+def collect_states():
+    """全ノードの状態を集める
+
+    push されたキャッシュが STATUS_MAX_AGE 以内ならそれを返し、
+    古い・未到着のノードにだけ直接問い合わせる (ノードごとに STATUS_PULL_INTERVAL 秒に1回まで)。
+    問い合わせを見送ったノードは、キャッシュか前回の問い合わせ結果をそのまま返す。
+    """
+    now = time.time()
+    with state_cache_lock:
+        cached = {node: state_cache.get(node) for node in NODES}
+        stale = [node for node, entry in cached.items() if entry is None or now - entry["last_seen"] > STATUS_MAX_AGE]
+        due = [node for node in stale if now - last_pull.get(node, {"at": float("-inf")})["at"] >= STATUS_PULL_INTERVAL]
+        for node in due:
+            # 同時に来た /status が同じノードへ重ねて問い合わせないよう、先に記録しておく
+            last_pull[node] = {**last_pull.get(node, {"failure": None}), "at": now}
+        previous = {node: last_pull.get(node, {}).get("failure") for node in stale}
+
+    pulled = {}
+    if due:
+        for node, body, latency in fan_out("GET", "/state", STATUS_TIMEOUT, nodes=due):
+            if body is None:
+                pulled[node] = {"node": node, "status": "offline" if latency is not None else "timeout", "latency_ms": latency}
+            else:
+                cache_state(node, body)
+                pulled[node] = {**body, "latency_ms": latency, "last_seen": time.time()}
+        with state_cache_lock:
+            for node in due:
+                last_pull[node]["failure"] = None if "last_seen" in pulled[node] else pulled[node]
 
-@app.route('/status')
-def status():
-    """全ノードの状態を収集（神の視点）"""
     network_state = []
     for node in NODES:
-        try:
-            resp = requests.get(f"http://{node}:8000/state", timeout=0.5)
-            network_state.append(resp.json())
-        except:
-            network_state.append({"node": node, "status": "offline"})
-    return jsonify(network_state)
+        entry = pulled.get(node)
+        if entry is None and node in stale:
+            entry = previous[node]  # 見送ったノードは前回の失敗結果 (前回成功していれば None)
+        if entry is not None and "last_seen" in entry:
+            network_state.append(entry)
+        elif cached[node] is not None:
+            # 問い合わせに失敗しても (見送っても)、最後に見た状態があれば添えて返す
+            network_state.append({**cached[node]["state"], **(entry or {}), "last_seen": cached[node]["last_seen"]})
+        elif entry is not None:
+            network_state.append(entry)
+        else:
+            # 一度も状態を見ておらず、問い合わせも見送った
+            network_state.append({"node": node, "status": "pending", "latency_ms": None})
+    return network_state
+
+@app.route('/status')
+def status():
+    """全ノードの状態を返す（神の視点）"""
+    return jsonify(collect_states())
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=3000)
@@ -0,0 +1,38 @@
+"""Gossip の JSON / バイナリ wire format の比較ベンチマーク
+
+    python bench_wire.py
+"""
+import json
+import timeit
+import numpy as np
+
+import wire
+from main import GossipPayload
+
+HASH = "ab" * 32
+
+def json_encode(vec):
+    return json.dumps({"sender_id": "node1", "vector": vec.tolist(),
+                       "relic_version": 1, "relic_hash": HASH}).encode()
+
+def json_decode(buf):
+    payload = GossipPayload(**json.loads(buf))
+    return np.array(payload.vector)
+
+def measure(fn, arg):
+    n, total = timeit.Timer(lambda: fn(arg)).autorange()
+    return total / n * 1e6
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    print(f"{'dim':>6} {'format':>8} {'bytes':>8} {'encode_us':>10} {'decode_us':>10}")
+    for dim in (4, 256, 4096):
+        vec = rng.normal(size=dim)
+        cases = [
+            ("json", json_encode, json_decode),
+            ("f64", lambda v: wire.encode("node1", v, 1, HASH, np.float64), wire.decode),
+            ("f32", lambda v: wire.encode("node1", v, 1, HASH, np.float32), wire.decode),
+        ]
+        for name, enc, dec in cases:
+            buf = enc(vec)
+            print(f"{dim:>6} {name:>8} {len(buf):>8} {measure(enc, vec):>10.2f} {measure(dec, buf):>10.2f}")
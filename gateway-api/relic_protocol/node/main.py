@@ -1,16 +1,25 @@
 import os
+import json
+import struct
 import logging
 import random
+import time
 import asyncio
-import requests
+import threading
+import httpx
 import numpy as np
-from fastapi import FastAPI, BackgroundTasks
-from pydantic import BaseModel
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
 from typing import List, Optional, Dict, Any
 
+import wire
+from relic_shared import relic_cache
+
 # ロギング設定
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] Node-%(message)s')
 logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)  # gossip 1送信ごとのログを抑制
 
 app = FastAPI()
 
@@ -18,7 +27,20 @@ app = FastAPI()
 DIM = 4
 LEARNING_RATE = 0.01  # 人格の適応率
 NODE_ID = os.getenv("NODE_ID", "node_unknown")
-PEERS = os.getenv("PEERS", "").split(",")
+# gossip に乗せる自分の宛先 ("host:port")。新しい Relic を見たピアはここから pull する
+NODE_ADDRESS = os.getenv("NODE_ADDRESS", f"{NODE_ID}:8000")
+PEERS = [p for p in os.getenv("PEERS", "").split(",") if p]
+GOSSIP_FANOUT = int(os.getenv("GOSSIP_FANOUT", "1"))      # 1ラウンドで同時に話しかける相手の数
+GOSSIP_TIMEOUT = float(os.getenv("GOSSIP_TIMEOUT", "0.5"))  # 1送信あたりの締め切り (秒)
+GOSSIP_ENCODING = os.getenv("GOSSIP_ENCODING", "json")      # json | binary (wire.py)
+GOSSIP_DTYPE = os.getenv("GOSSIP_DTYPE", "float64")          # binary 時のベクトル精度 (float32 | float64)
+GATEWAY_URL = os.getenv("GATEWAY_URL", "")                   # 例: http://gateway:3000 (空なら push しない)
+PUSH_THRESHOLD = float(os.getenv("PUSH_THRESHOLD", "0.01"))  # この距離以上 state_vector が動いたら push
+PUSH_HEARTBEAT = float(os.getenv("PUSH_HEARTBEAT", "5.0"))   # 変化がなくてもこの秒数ごとに push
+PUSH_INTERVAL = 0.2
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "0"))  # >0 なら この秒数内の gossip を平均して1回だけ統合する
+GOSSIP_RELAY = int(os.getenv("GOSSIP_RELAY", "0"))  # >0 なら直接届いた他ノードの最新状態を、次のラウンドでこの件数まで中継する
+ANTI_ENTROPY_INTERVAL = float(os.getenv("ANTI_ENTROPY_INTERVAL", "10.0"))  # Relic バージョン照合の周期 (秒)
 
 # --- 状態 ---
 # 人格行列 (直交行列で初期化)
@@ -38,34 +60,71 @@ def update(self_state, neighbor_signal, human_input):
     alpha = 0.1
     return self_state + alpha * (neighbor_signal - self_state)
 """
-relic_scope = {}
+relic_update = None  # コンパイル済みの update 関数
+# Relic のバージョン (単調増加) と内容ハッシュ。gossip に乗せて伝播させる
+relic_version = 0
+relic_initial_input: Optional[List[float]] = None
+relic_fetching = 0  # 取得中のバージョン (重複 pull 防止)
+
+relic_hash = relic_cache.source_hash
+
+current_relic_hash = relic_hash(current_relic_code)
 
 def compile_relic(code_str: str):
-    """Relicコードをコンパイルして実行可能にする"""
-    global relic_scope
+    """Relicコードをコンパイルした update 関数を返す (失敗したら None)"""
     try:
-        exec(code_str, {}, relic_scope)
-        if 'update' not in relic_scope:
-            raise Exception("Relic must define an 'update' function.")
-        logger.info("New Relic installed successfully.")
-    except Exception as e:
-        logger.error(f"Failed to compile Relic: {e}")
+        return relic_cache.compile_function(code_str, "update", arity=3)
+    except relic_cache.RelicError as e:
+        logger.error(str(e))
+        return None
 
 # 初期コンパイル
-compile_relic(current_relic_code)
+relic_update = compile_relic(current_relic_code)
 
 # --- Models ---
 class RelicPayload(BaseModel):
     code: str
     initial_input: List[float]
+    version: Optional[int] = None
 
 class GossipPayload(BaseModel):
     sender_id: str
     vector: List[float]
+    relic_version: int = 0
+    relic_hash: str = ""
+    address: str = ""  # Relic を pull する "host:port" (空なら送信元からは pull しない)
 
 class HumanInput(BaseModel):
     content: str
 
+# /gossip は Request から生のボディを読むので、OpenAPI には受け付ける2形式を明示しておく
+GOSSIP_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            wire.JSON_CONTENT_TYPE: {"schema": GossipPayload.model_json_schema()},
+            wire.CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
+}
+
+GOSSIP_BATCH_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            wire.JSON_CONTENT_TYPE: {"schema": {
+                "type": "object",
+                "required": ["messages"],
+                "properties": {"messages": {"type": "array", "items": GossipPayload.model_json_schema()}},
+            }},
+            wire.CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
+}
+
+# 壊れた gossip (JSON / スキーマ / バイナリフレーム) として 400 を返す例外
+GOSSIP_DECODE_ERRORS = (ValueError, TypeError, ValidationError, struct.error)
+
 # --- Core Logic ---
 
 def process_integration(neighbor_vec: np.ndarray):
@@ -78,7 +137,7 @@ def process_integration(neighbor_vec: np.ndarray):
 
     # 2. Execution (Relic関数の実行)
     try:
-        func = relic_scope.get('update')
+        func = relic_update
         # 関数に (自分の状態, 解釈された相手の意見, 人間の介入) を渡す
         new_state = func(state_vector, interpreted_signal, human_intervention)
 
@@ -106,42 +165,252 @@ def process_integration(neighbor_vec: np.ndarray):
     # (直交性を維持するために本当はもっと複雑だが、ここでは簡易実装)
     pass
 
+# 受信した gossip の集約バッファ (COALESCE_WINDOW > 0 の時に使う)
+inbox_lock = threading.Lock()
+inbox_sum: Optional[np.ndarray] = None
+inbox_count = 0
+
+def accept_gossip(vectors: np.ndarray):
+    """受信ベクトル (k, DIM) を統合する
+
+    relic-explorer の PersonaNode.process_cycle と同じく、届いた意見の平均を1回だけ解釈・統合する。
+    COALESCE_WINDOW > 0 なら即座には統合せず、次の窓まで inbox に溜める。
+    """
+    global inbox_sum, inbox_count
+    if vectors.ndim != 2 or vectors.shape[1] != DIM:
+        # 受信側 (/gossip, /gossip_batch) で次元を検証済みのはず。溜まった分は捨てずに弾く
+        raise ValueError(f"gossip vectors must have shape (k, {DIM}), got {vectors.shape}")
+    if COALESCE_WINDOW <= 0:
+        process_integration(vectors.mean(axis=0))
+        return
+    with inbox_lock:
+        if inbox_sum is None:
+            inbox_sum = np.zeros(DIM)
+        inbox_sum += vectors.sum(axis=0)
+        inbox_count += len(vectors)
+
 # --- Tasks ---
 
+async def coalesce_loop():
+    """COALESCE_WINDOW ごとに inbox の平均で1回だけ統合する"""
+    global inbox_count
+    while True:
+        await asyncio.sleep(COALESCE_WINDOW)
+        with inbox_lock:
+            if not inbox_count:
+                continue
+            mean = inbox_sum / inbox_count
+            inbox_sum[:] = 0
+            inbox_count = 0
+        await run_in_threadpool(process_integration, mean)
+
+# ピア / Gateway ごとに keep-alive 接続を使い回す非同期クライアント (startup で生成)
+http_client: Optional[httpx.AsyncClient] = None
+
+# 中継待ちのメッセージ (sender_id -> wire.decode と同じ (sender_id, vector, relic_version, relic_hash, address))
+# 受信ハンドラと gossip_loop はどちらもイベントループ上で動くのでロックは要らない
+relay_pending: Dict[str, tuple] = {}
+
+def remember_for_relay(message):
+    """直接届いたメッセージを次のラウンドの中継候補にする (送信者ごとに最新の1件)"""
+    if GOSSIP_RELAY > 0 and message[0] != NODE_ID:
+        relay_pending.pop(message[0], None)
+        relay_pending[message[0]] = message
+
+def encode_batch(messages):
+    """メッセージ列を GOSSIP_ENCODING で /gossip_batch の (body, content_type) にエンコードする
+
+    先頭は自分の状態。受け手は先頭だけを直接届いたものとして扱うので、中継は1ホップで止まる。
+    """
+    if GOSSIP_ENCODING == "binary":
+        body = b"".join(
+            wire.encode(sender, vec, version, digest, GOSSIP_DTYPE, address)
+            for sender, vec, version, digest, address in messages
+        )
+        return body, wire.CONTENT_TYPE
+    payload = {"messages": [
+        {
+            "sender_id": sender,
+            "vector": np.asarray(vec).tolist(),
+            "relic_version": version,
+            "relic_hash": digest,
+            "address": address,
+        }
+        for sender, vec, version, digest, address in messages
+    ]}
+    return json.dumps(payload).encode(), wire.JSON_CONTENT_TYPE
+
+async def send_gossip(target: str, body: bytes, content_type: str):
+    """1ピアへの送信。締め切りを超えたら諦める（イベントループは止めない）"""
+    try:
+        await asyncio.wait_for(
+            http_client.post(f"http://{target}:8000/gossip_batch", content=body,
+                             headers={"Content-Type": content_type}),
+            timeout=GOSSIP_TIMEOUT
+        )
+    except Exception:
+        # オフラインのノードは無視
+        pass
+
 async def gossip_loop():
     """定期的に噂話をするバックグラウンドタスク"""
     while True:
         await asyncio.sleep(random.uniform(1.0, 3.0))
-        if not PEERS or PEERS == ['']:
+        if not PEERS:
             continue
 
-        target = random.choice(PEERS)
+        targets = random.sample(PEERS, k=min(GOSSIP_FANOUT, len(PEERS)))
+        own = (NODE_ID, state_vector, relic_version, current_relic_hash, NODE_ADDRESS)
+        relayed = list(relay_pending.values())
+        relay_pending.clear()
+        # 宛先ごとに、自分の状態と中継分 (宛先自身の状態は除く) を1回の /gossip_batch にまとめ、k 人に同時送信
+        sends = []
+        for target in targets:
+            messages = [own]
+            if GOSSIP_RELAY > 0:
+                messages += [m for m in relayed if m[0] != target][-GOSSIP_RELAY:]
+            body, content_type = encode_batch(messages)
+            sends.append(send_gossip(target, body, content_type))
+        await asyncio.gather(*sends)
+
+def install_relic(code: str, version: int, initial_input: Optional[List[float]]) -> bool:
+    """Relic をインストールする (inject と gossip 経由の pull で共通)
+
+    先にコンパイルし、成功した時だけ本体・ハッシュ・バージョンを差し替える。
+    失敗したら直前の Relic とバージョンのまま False を返す (壊れた Relic を gossip で広めない)。
+    """
+    global current_relic_code, current_relic_hash, relic_version, relic_initial_input, state_vector, relic_update
+    func = compile_relic(code)
+    if func is None:
+        return False
+    relic_update = func
+    current_relic_code = code
+    current_relic_hash = relic_hash(code)
+    relic_version = version
+    relic_initial_input = initial_input
+    if initial_input is not None:
+        state_vector = np.array(initial_input)
+    logger.info(f"Relic v{version} installed successfully.")
+    return True
+
+async def fetch_relic(address: str, version: int):
+    """より新しい Relic を持つピア ("host:port") から本体を pull する"""
+    global relic_fetching
+    if not address or version <= max(relic_version, relic_fetching):
+        return
+    relic_fetching = version
+    try:
+        resp = await asyncio.wait_for(
+            http_client.get(f"http://{address}/relic"),
+            timeout=GOSSIP_TIMEOUT
+        )
+        relic = resp.json()
+        if relic_hash(relic["code"]) != relic["hash"]:
+            raise ValueError("relic hash mismatch")
+        # 相手が pull 前にさらに更新していた場合も、新しければそのまま採用する
+        if relic["version"] > relic_version and install_relic(relic["code"], relic["version"], relic["initial_input"]):
+            logger.info(f"Relic v{relic_version} pulled from {address}")
+    except Exception as e:
+        logger.warning(f"Failed to pull Relic v{version} from {address}: {e}")
+    finally:
+        relic_fetching = 0
+
+async def anti_entropy_loop():
+    """取りこぼしを拾うため、定期的にランダムなピアとバージョンを照合する"""
+    while True:
+        await asyncio.sleep(random.uniform(0.5, 1.5) * ANTI_ENTROPY_INTERVAL)
+        if not PEERS:
+            continue
+        peer = random.choice(PEERS)
+        # 1ピアの不正な応答 (オブジェクト以外・version 欠落など) でループ自体を止めない
         try:
-            # 自分の状態を送信
-            requests.post(
-                f"http://{target}:8000/gossip",
-                json={"sender_id": NODE_ID, "vector": state_vector.tolist()},
-                timeout=0.5
+            resp = await asyncio.wait_for(
+                http_client.get(f"http://{peer}:8000/relic/version"),
+                timeout=GOSSIP_TIMEOUT
             )
+            remote = resp.json()
+            version = remote.get("version") if isinstance(remote, dict) else None
+            if not isinstance(version, int) or isinstance(version, bool):
+                continue
+            if version > relic_version:
+                await fetch_relic(f"{peer}:8000", version)
         except Exception as e:
-            # オフラインのノードは無視
+            logger.debug(f"Anti-entropy with {peer} failed: {e}")
+
+async def state_push_loop():
+    """state_vector が意味のある変化をした時 (またはハートビート) に Gateway へ状態を push する"""
+    last_vec = None
+    last_input = None
+    last_relic = None
+    last_push = 0.0
+    while True:
+        await asyncio.sleep(PUSH_INTERVAL)
+        changed = (
+            last_vec is None
+            or last_vec.shape != state_vector.shape
+            or np.linalg.norm(state_vector - last_vec) >= PUSH_THRESHOLD
+            or human_intervention != last_input
+            or relic_version != last_relic
+        )
+        if not changed and time.monotonic() - last_push < PUSH_HEARTBEAT:
+            continue
+
+        snapshot = get_state()
+        try:
+            await asyncio.wait_for(
+                http_client.post(f"{GATEWAY_URL}/report", json=snapshot),
+                timeout=GOSSIP_TIMEOUT
+            )
+            last_vec = np.array(snapshot["vector"])
+            last_input = snapshot["human_input_buffer"]
+            last_relic = snapshot["relic_version"]
+            last_push = time.monotonic()
+        except Exception:
+            # Gateway が落ちていても次の周期で再送する
             pass
 
 @app.on_event("startup")
 async def startup_event():
+    global http_client
+    http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(GOSSIP_TIMEOUT),
+        limits=httpx.Limits(max_keepalive_connections=len(PEERS) + 1, keepalive_expiry=30.0),
+    )
     asyncio.create_task(gossip_loop())
+    asyncio.create_task(anti_entropy_loop())
+    if COALESCE_WINDOW > 0:
+        asyncio.create_task(coalesce_loop())
+    if GATEWAY_URL:
+        asyncio.create_task(state_push_loop())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if http_client is not None:
+        await http_client.aclose()
 
 # --- Endpoints ---
 
 @app.post("/inject_relic")
 def inject_relic(payload: RelicPayload):
-    """新しいRelic（契約）をインストール"""
-    global current_relic_code, state_vector
-    current_relic_code = payload.code
-    state_vector = np.array(payload.initial_input)
-    # 再コンパイル
-    compile_relic(current_relic_code)
-    return {"status": "Relic updated", "node": NODE_ID}
+    """新しいRelic（契約）をインストール。以降は gossip で他ノードへ広がる"""
+    version = payload.version if payload.version is not None else relic_version + 1
+    if not install_relic(payload.code, version, payload.initial_input):
+        raise HTTPException(status_code=400, detail="Relic failed to compile; keeping the current version")
+    return {"status": "Relic updated", "node": NODE_ID, "version": relic_version, "hash": current_relic_hash}
+
+@app.get("/relic")
+def get_relic():
+    """現在の Relic 本体 (新しいバージョンを見たピアが pull する)"""
+    return {
+        "code": current_relic_code,
+        "version": relic_version,
+        "hash": current_relic_hash,
+        "initial_input": relic_initial_input,
+    }
+
+@app.get("/relic/version")
+def get_relic_version():
+    return {"version": relic_version, "hash": current_relic_hash}
 
 @app.post("/human_input")
 def set_human_input(payload: HumanInput):
@@ -151,18 +420,83 @@ def set_human_input(payload: HumanInput):
     logger.info(f"Human intervention received: {payload.content}")
     return {"status": "Input accepted", "node": NODE_ID}
 
-@app.post("/gossip")
-def receive_gossip(payload: GossipPayload):
-    """他ノードからの入力を受け取り、思考を回す"""
-    incoming_vec = np.array(payload.vector)
-    process_integration(incoming_vec)
+@app.post("/gossip", openapi_extra=GOSSIP_OPENAPI)
+async def receive_gossip(request: Request, background_tasks: BackgroundTasks):
+    """他ノードからの入力を受け取り、思考を回す
+
+    Content-Type が wire.CONTENT_TYPE ならバイナリ、それ以外は JSON (GossipPayload) として読む。
+    読めないボディは 400。
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith(wire.CONTENT_TYPE):
+            message = wire.decode(body, DIM)
+        else:
+            payload = GossipPayload.model_validate(json.loads(body))
+            message = (payload.sender_id, np.array(payload.vector), payload.relic_version,
+                       payload.relic_hash, payload.address)
+            if message[1].shape != (DIM,):
+                raise ValueError(f"vector must have {DIM} elements, got {len(message[1])}")
+    except GOSSIP_DECODE_ERRORS as e:
+        raise HTTPException(status_code=400, detail=f"malformed gossip: {e}")
+    _, incoming_vec, version, _, address = message
+    await run_in_threadpool(accept_gossip, incoming_vec[None, :])
+    remember_for_relay(message)
+    # 相手の方が新しい Relic を持っていれば、応答後に相手が名乗った宛先から pull する
+    if version > relic_version:
+        background_tasks.add_task(fetch_relic, address, version)
     return {"status": "ack"}
 
+def parse_batch_message(item):
+    """JSON バッチの1件を wire.decode と同じタプルにする (不正なら None)"""
+    try:
+        m = GossipPayload.model_validate(item)
+    except ValidationError:
+        return None
+    vec = np.array(m.vector)
+    return (m.sender_id, vec, m.relic_version, m.relic_hash, m.address) if vec.shape == (DIM,) else None
+
+@app.post("/gossip_batch", openapi_extra=GOSSIP_BATCH_OPENAPI)
+async def receive_gossip_batch(request: Request, background_tasks: BackgroundTasks):
+    """複数送信者のベクトルをまとめて受け取り、平均して1回だけ統合する
+
+    バイナリ (wire.CONTENT_TYPE のフレーム連結) または JSON ({"messages": [GossipPayload, ...]})。
+    次元違いなど中身が不正なメッセージだけを捨て (dropped に数える)、残りを統合する。
+    バッチ全体が読めない時は 400。先頭は送信元自身の状態 (gossip_loop の送り方) とみなし、中継候補にする。
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith(wire.CONTENT_TYPE):
+            frames = wire.decode_many(body, DIM)
+        else:
+            items = json.loads(body)["messages"]
+            if not isinstance(items, list):
+                raise TypeError("'messages' must be a list")
+            frames = [parse_batch_message(item) for item in items]
+        messages = [m for m in frames if m is not None]
+    except (*GOSSIP_DECODE_ERRORS, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"malformed gossip batch: {e}")
+    dropped = len(frames) - len(messages)
+    if dropped:
+        logger.warning(f"Dropped {dropped} malformed gossip message(s) from a batch of {len(frames)}")
+    if not messages:
+        return {"status": "ack", "count": 0, "dropped": dropped}
+
+    await run_in_threadpool(accept_gossip, np.stack([m[1] for m in messages]))
+    if frames[0] is not None:
+        remember_for_relay(frames[0])
+    _, _, version, _, address = max(messages, key=lambda m: m[2])
+    if version > relic_version:
+        background_tasks.add_task(fetch_relic, address, version)
+    return {"status": "ack", "count": len(messages), "dropped": dropped}
+
 @app.get("/state")
 def get_state():
     """現在の状態と思考のスナップショット"""
     return {
         "node": NODE_ID,
         "vector": state_vector.tolist(),
-        "human_input_buffer": human_intervention
+        "human_input_buffer": human_intervention,
+        "relic_version": relic_version,
+        "relic_hash": current_relic_hash
     }
@@ -0,0 +1,49 @@
+"""gossip_loop の送り方 (宛先ごとに1回の /gossip_batch) と受信側の集約
+
+    cd node && PYTHONPATH=../../../shared python -m pytest -q test_gossip_batch.py
+"""
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import wire
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "COALESCE_WINDOW", 0)
+    monkeypatch.setattr(main, "relay_pending", {})
+    monkeypatch.setattr(main, "state_vector", np.array([1.0, 0.0, 0.0, 0.0]))
+    return TestClient(main.app)
+
+def own(sender="n9", vec=(0.0, 1.0, 0.0, 0.0)):
+    return (sender, np.array(vec), 0, "", f"{sender}:8000")
+
+@pytest.mark.parametrize("encoding", ["json", "binary"])
+def test_encoded_batch_is_accepted(client, monkeypatch, encoding):
+    monkeypatch.setattr(main, "GOSSIP_ENCODING", encoding)
+    body, content_type = main.encode_batch([own("n8"), own("n9")])
+    r = client.post("/gossip_batch", content=body, headers={"Content-Type": content_type})
+    assert r.status_code == 200
+    assert r.json() == {"status": "ack", "count": 2, "dropped": 0}
+
+def test_bad_messages_are_dropped(client):
+    body = {"messages": [
+        {"sender_id": "a", "vector": [1, 0, 0, 0]},
+        {"sender_id": "b", "vector": [1, 0, 0]},
+        {"vector": [1, 0, 0, 0]},
+    ]}
+    r = client.post("/gossip_batch", content=json.dumps(body))
+    assert r.json() == {"status": "ack", "count": 1, "dropped": 2}
+
+def test_unreadable_batch_is_400(client):
+    r = client.post("/gossip_batch", content=b"RG\x08", headers={"Content-Type": wire.CONTENT_TYPE})
+    assert r.status_code == 400
+
+def test_only_the_first_message_is_relayed(client, monkeypatch):
+    monkeypatch.setattr(main, "GOSSIP_RELAY", 4)
+    body, content_type = main.encode_batch([own("n8"), own("n9")])
+    client.post("/gossip_batch", content=body, headers={"Content-Type": content_type})
+    assert list(main.relay_pending) == ["n8"]
@@ -0,0 +1,63 @@
+"""wire.py (gossip のバイナリ形式) の encode / decode
+
+    cd node && python -m pytest -q test_wire.py
+"""
+import numpy as np
+import pytest
+
+import wire
+
+HASH = "ab" * 32
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_round_trip(dtype):
+    vec = np.array([0.5, -1.25, 3.0, 1e-3])
+    buf = wire.encode("node1", vec, 7, HASH, dtype, "node1:8000")
+    sender, out, version, relic_hash, address = wire.decode(buf, 4)
+    assert (sender, version, relic_hash, address) == ("node1", 7, HASH, "node1:8000")
+    assert out.dtype == np.float64
+    np.testing.assert_array_equal(out, vec.astype(dtype))
+
+def test_defaults_round_trip_empty_hash_and_address():
+    buf = wire.encode("n", np.zeros(3))
+    assert wire.decode(buf) == ("n", pytest.approx(np.zeros(3)), 0, "", "")
+
+def test_non_ascii_sender():
+    buf = wire.encode("ノード", np.ones(2), address="ノード:8000")
+    assert wire.decode(buf)[0] == "ノード"
+    assert wire.decode(buf)[4] == "ノード:8000"
+
+def test_dim_mismatch_is_rejected():
+    buf = wire.encode("node1", np.ones(3))
+    with pytest.raises(ValueError):
+        wire.decode(buf, 4)
+
+@pytest.mark.parametrize("mutate", [
+    lambda b: b[:-1],              # 途中で切れている
+    lambda b: b + b"\0",           # 余計なバイト
+    lambda b: b"XX" + b[2:],       # magic が違う
+    lambda b: b[:2] + b"\x05" + b[3:],  # 未知の dtype
+])
+def test_malformed_frames_are_rejected(mutate):
+    buf = wire.encode("node1", np.ones(4), 1, HASH)
+    with pytest.raises(ValueError):
+        wire.decode(mutate(buf), 4)
+
+def test_decode_many_round_trip():
+    frames = [("a", np.ones(4), 1, HASH, "a:8000"), ("b", np.arange(4.0), 2, "", "")]
+    buf = b"".join(wire.encode(s, v, ver, h, np.float64, a) for s, v, ver, h, a in frames)
+    out = wire.decode_many(buf, 4)
+    assert [f[0] for f in out] == ["a", "b"]
+    assert [(f[2], f[3], f[4]) for f in out] == [(1, HASH, "a:8000"), (2, "", "")]
+    np.testing.assert_array_equal(out[1][1], np.arange(4.0))
+
+def test_decode_many_marks_bad_frames_and_keeps_reading():
+    buf = wire.encode("a", np.ones(4)) + wire.encode("b", np.ones(3)) + wire.encode("c", np.ones(4))
+    out = wire.decode_many(buf, 4)
+    assert out[1] is None
+    assert [out[0][0], out[2][0]] == ["a", "c"]
+
+def test_decode_many_rejects_truncated_batch():
+    buf = wire.encode("a", np.ones(4)) + wire.encode("b", np.ones(4))
+    with pytest.raises(ValueError):
+        wire.decode_many(buf[:-3], 4)
@@ -0,0 +1,84 @@
+"""Gossip のバイナリ wire format
+
+JSON の float リストの代わりに、固定長ヘッダ + 生の little-endian 浮動小数点列を送る。
+
+    magic   2B  b"RG"
+    dtype   1B  4 = float32, 8 = float64
+    id_len  1B  sender_id のバイト長
+    addr_len 1B address のバイト長 (0 なら無し)
+    dim     4B  uint32
+    version 8B  uint64 (relic_version)
+    hash   32B  relic_hash (sha256 digest, 無ければ 0 埋め)
+    sender  id_len B (utf-8)
+    address addr_len B (utf-8, Relic を pull する "host:port")
+    vector  dim * dtype B
+
+/gossip_batch ではこのフレームを単純に連結して送る。
+"""
+import struct
+import numpy as np
+
+CONTENT_TYPE = "application/x-relic-gossip"
+JSON_CONTENT_TYPE = "application/json"
+
+MAGIC = b"RG"
+HEADER = struct.Struct("<2sBBBIQ32s")
+DTYPES = {4: np.dtype("<f4"), 8: np.dtype("<f8")}
+
+def encode(sender_id: str, vector: np.ndarray, relic_version: int = 0, relic_hash: str = "",
+           dtype=np.float64, address: str = "") -> bytes:
+    dt = np.dtype(dtype).newbyteorder("<")
+    sender = sender_id.encode()
+    addr = address.encode()
+    digest = bytes.fromhex(relic_hash) if relic_hash else b""
+    header = HEADER.pack(MAGIC, dt.itemsize, len(sender), len(addr), len(vector), relic_version, digest)
+    return header + sender + addr + np.asarray(vector, dtype=dt).tobytes()
+
+def _decode_at(buf: bytes, offset: int, dim_expected: int = None):
+    """offset から1フレーム読み、(frame, 次のフレームの offset) を返す
+
+    dim_expected と次元が違うフレーム、sender / address が utf-8 でないフレームは frame=None
+    (枠は読めているので、続くフレームはそのまま読める)。
+    """
+    magic, size, id_len, addr_len, dim, version, digest = HEADER.unpack_from(buf, offset)
+    if magic != MAGIC or size not in DTYPES:
+        raise ValueError("not a relic gossip frame")
+    addr_start = offset + HEADER.size + id_len
+    start = addr_start + addr_len
+    end = start + dim * size
+    if len(buf) < end:
+        raise ValueError("truncated relic gossip frame")
+    if dim_expected is not None and dim != dim_expected:
+        return None, end
+    try:
+        sender = bytes(buf[offset + HEADER.size:addr_start]).decode()
+        address = bytes(buf[addr_start:start]).decode()
+    except UnicodeDecodeError:
+        return None, end
+    vector = np.frombuffer(buf, dtype=DTYPES[size], count=dim, offset=start).astype(float, copy=False)
+    relic_hash = digest.hex() if any(digest) else ""
+    return (sender, vector, version, relic_hash, address), end
+
+def decode(buf: bytes, dim: int = None):
+    """(sender_id, vector, relic_version, relic_hash, address) を返す
+
+    dim を指定すると、次元が違うフレームは ValueError。
+    """
+    frame, end = _decode_at(buf, 0, dim)
+    if end != len(buf):
+        raise ValueError("trailing bytes after relic gossip frame")
+    if frame is None:
+        raise ValueError(f"relic gossip frame is not a valid {dim}-dim message")
+    return frame
+
+def decode_many(buf: bytes, dim: int = None):
+    """連結されたフレーム列 (/gossip_batch 用) を decode のタプルのリストにする
+
+    dim と次元が違うフレームなど、中身だけが不正なフレームはその位置を None にする
+    (呼び出し側で捨てる)。枠自体が壊れていて続きを読めない時だけ ValueError。
+    """
+    frames, offset = [], 0
+    while offset < len(buf):
+        frame, offset = _decode_at(buf, offset, dim)
+        frames.append(frame)
+    return frames
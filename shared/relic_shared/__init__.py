@@ -0,0 +1 @@
+"""S3Protocol Relic の各バックエンド・実験で共通に使うモジュール (README.md を参照)"""
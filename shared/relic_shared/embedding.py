@@ -0,0 +1,133 @@
+"""PCA / UMAP 埋め込みのディスクキャッシュ
+
+fit 済みの reducer と埋め込み結果を、データのハッシュ + パラメータをキーにして
+cache_dir に保存する。同じデータ・同じパラメータで呼ばれたら fit せずに読み込むだけなので、
+プロットの見た目だけを変えて再実行するときは UMAP の import すら発生しない。
+
+データのハッシュは呼び出しのたびに配列全体を読んで計算する。入力ファイルの更新時刻など
+データを特定できる安い値があれば key= で渡すと、ハッシュの代わりにそれ (+ 形状・dtype) を使う。
+UMAP は結果が random_state に依存するので random_state もキーに入る (整数のみ、既定 0)。
+
+大きなデータでは
+- PCA:  PCA_INCREMENTAL_ROWS 行を超えたら IncrementalPCA をブロックごとに partial_fit
+- UMAP: UMAP_FIT_ROWS 行のサブサンプルで fit し、残りは transform (out-of-sample)
+に切り替える。
+
+    from relic_shared.embedding import pca, umap
+    Z = pca(X, cache_dir="output/.embed_cache")
+    Z = umap(X, n_neighbors=5, min_dist=0.3, cache_dir="output/.embed_cache")
+    Z = umap(X, key=f"run.traj@{mtime}")   # 配列全体をハッシュしない
+"""
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+
+CACHE_DIR = os.getenv("EMBED_CACHE", ".embed_cache")
+PCA_INCREMENTAL_ROWS = int(os.getenv("PCA_INCREMENTAL_ROWS", "100000"))
+UMAP_FIT_ROWS = int(os.getenv("UMAP_FIT_ROWS", "20000"))
+BLOCK_ROWS = 50_000
+
+def data_hash(X):
+    """配列の形状・dtype・内容の sha256 (memmap でもブロックごとに読む)"""
+    h = hashlib.sha256(f"{X.shape}{X.dtype}".encode())
+    flat = X.reshape(len(X), -1) if X.ndim else X.reshape(1)
+    for start in range(0, len(flat), BLOCK_ROWS):
+        h.update(np.ascontiguousarray(flat[start:start + BLOCK_ROWS]).tobytes())
+    return h.hexdigest()
+
+def _blocks(n):
+    for start in range(0, n, BLOCK_ROWS):
+        yield slice(start, min(start + BLOCK_ROWS, n))
+
+def _transform(reducer, X, n_components):
+    Z = np.empty((len(X), n_components))
+    for s in _blocks(len(X)):
+        Z[s] = reducer.transform(np.asarray(X[s], dtype=float))
+    return Z
+
+def _cache_path(kind, X, params, cache_dir, key=None):
+    data = data_hash(X) if key is None else ["key", str(key), X.shape, str(X.dtype)]
+    digest = hashlib.sha256(
+        json.dumps([kind, data, params], sort_keys=True, default=str).encode()
+    ).hexdigest()[:24]
+    return os.path.join(cache_dir or CACHE_DIR, f"{kind}-{digest}")
+
+def _cached(kind, X, params, cache_dir, fit, key=None):
+    """(kind, data_hash または key, params) をキーに (reducer, Z) をキャッシュする"""
+    path = _cache_path(kind, X, params, cache_dir, key)
+    if os.path.exists(path + ".npy"):
+        return np.load(path + ".npy")
+
+    reducer, Z = fit()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 埋め込みを最後に置くので、.npy があれば reducer も揃っている。
+    # 同じキーを複数プロセスが同時に書いても壊れないよう、一時ファイル名にはプロセス ID を入れる
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp + ".pkl", "wb") as f:
+        pickle.dump(reducer, f)
+    os.replace(tmp + ".pkl", path + ".pkl")
+    np.save(tmp + ".npy", Z)
+    os.replace(tmp + ".npy", path + ".npy")
+    return Z
+
+def load_reducer(kind, X, n_components=2, cache_dir=None, key=None, **params):
+    """pca() / umap() が X に対して保存した fit 済み reducer を返す (無ければ None)。新しいデータの transform 用
+
+    pca() / umap() に渡したのと同じ key / パラメータ (umap なら random_state も) を渡すこと。
+    """
+    if kind == "umap":
+        params.setdefault("random_state", 0)
+    path = _cache_path(kind, np.asanyarray(X), {"n_components": n_components, **params}, cache_dir, key) + ".pkl"
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def pca(X, n_components=2, cache_dir=None, key=None, **params):
+    """PCA 埋め込み (行数が多ければ IncrementalPCA)"""
+    X = np.asanyarray(X)
+    params = {"n_components": n_components, **params}
+
+    def fit():
+        from sklearn.decomposition import PCA, IncrementalPCA
+        if len(X) <= PCA_INCREMENTAL_ROWS:
+            reducer = PCA(**params)
+            return reducer, reducer.fit_transform(np.asarray(X, dtype=float))
+        reducer = IncrementalPCA(**params)
+        for s in _blocks(len(X)):
+            reducer.partial_fit(np.asarray(X[s], dtype=float))
+        return reducer, _transform(reducer, X, n_components)
+
+    return _cached("pca", X, params, cache_dir, fit, key)
+
+def umap(X, n_components=2, cache_dir=None, key=None, random_state=0, **params):
+    """UMAP 埋め込み (行数が多ければサブサンプルで fit し、残りは transform)
+
+    結果をキャッシュするので random_state は固定の整数にする (キーに含まれる)。
+    """
+    if not isinstance(random_state, (int, np.integer)):
+        raise ValueError(f"umap() caches its result, so random_state must be a fixed int, got {random_state!r}")
+    X = np.asanyarray(X)
+    params = {"n_components": n_components, "random_state": random_state, **params}
+
+    def fit():
+        import umap as umap_lib
+        reducer = umap_lib.UMAP(**params)
+        if len(X) <= UMAP_FIT_ROWS:
+            return reducer, reducer.fit_transform(np.asarray(X, dtype=float))
+        idx = np.sort(np.random.default_rng(random_state).choice(len(X), UMAP_FIT_ROWS, replace=False))
+        reducer.fit(np.asarray(X[idx], dtype=float))
+        rest = np.ones(len(X), dtype=bool)
+        rest[idx] = False
+        Z = np.empty((len(X), n_components))
+        Z[idx] = reducer.embedding_
+        for s in _blocks(len(X)):
+            m = rest[s]
+            if m.any():
+                Z[s][m] = reducer.transform(np.asarray(X[s][m], dtype=float))
+        return reducer, Z
+
+    return _cached("umap", X, params, cache_dir, fit, key)
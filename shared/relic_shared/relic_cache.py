@@ -0,0 +1,127 @@
+"""Relic コンパイルキャッシュ
+
+Relic のソースを内容ハッシュ (sha256) で引く LRU にコンパイル済みの関数として保持する。
+ソースのパース・コンパイルとシグネチャ検証は deploy 時の1回だけで済み、
+tick ループでは返された関数を呼ぶだけになる。
+
+- compile_function: `def update(...)` を定義する Relic (gateway node / relic-explorer)
+- compile_script:   `vector` / `neighbors` / `np` を読んで `result` に書くスクリプト (app-explorer-v2)
+"""
+import ast
+import hashlib
+import inspect
+import os
+import threading
+from collections import OrderedDict
+
+CACHE_SIZE = int(os.getenv("RELIC_CACHE_SIZE", "128"))
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+class RelicError(ValueError):
+    """Relic のコンパイル失敗、または期待するシグネチャを満たさない"""
+
+def source_hash(source: str) -> str:
+    return hashlib.sha256(source.encode()).hexdigest()
+
+def _cached(key, build):
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return _cache[key]
+    func = build()  # 失敗時は RelicError がそのまま伝播し、キャッシュされない
+    with _lock:
+        _stats["misses"] += 1
+        _cache[key] = func
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return func
+
+def compile_function(source: str, name: str = "update", arity: int = None):
+    """`name` という関数を定義する Relic をコンパイルし、その関数を返す
+
+    arity を指定すると、その個数の位置引数で呼べるかを検証する。
+    """
+    def build():
+        namespace = {}
+        try:
+            exec(compile(source, f"<relic:{name}>", "exec"), namespace)
+        except Exception as e:
+            raise RelicError(f"Failed to compile Relic: {e}") from e
+        func = namespace.get(name)
+        if not callable(func):
+            raise RelicError(f"Relic must define an '{name}' function.")
+        if arity is not None:
+            try:
+                inspect.signature(func).bind(*([None] * arity))
+            except TypeError as e:
+                raise RelicError(f"'{name}' must accept {arity} positional arguments: {e}") from e
+        return func
+
+    return _cached(("function", source_hash(source), name, arity), build)
+
+# 関数に包むと意味が変わってしまう文 (モジュール直下では SyntaxError になるもの)
+_SCRIPT_FORBIDDEN = {ast.Return: "return", ast.Yield: "yield", ast.YieldFrom: "yield from"}
+
+def _check_script(module: ast.Module):
+    """スクリプト直下 (入れ子の関数・lambda の外) の return / yield を拒否する
+
+    本体は関数の中に包んで実行するので、そのままだと return で result を飛ばしたり、
+    yield で関数ごと generator に変わったりしてしまう。
+    """
+    stack = list(module.body)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            continue
+        for kind, keyword in _SCRIPT_FORBIDDEN.items():
+            if isinstance(node, kind):
+                raise RelicError(f"Relic scripts must not use '{keyword}' outside a function (line {node.lineno})")
+        stack.extend(ast.iter_child_nodes(node))
+
+def compile_script(source: str, inputs=("vector", "neighbors", "np"), output: str = "result"):
+    """スクリプト型の Relic を `f(*inputs) -> output` の関数に変換して返す
+
+    スクリプト本体を AST のまま関数の中に包むので、呼び出しごとの exec や
+    ローカル辞書の生成が不要になる。output に代入しなかった場合は None を返す。
+    スクリプト直下の return / yield は RelicError。
+    """
+    def build():
+        try:
+            module = ast.parse(source, filename="<relic:script>")
+        except Exception as e:
+            raise RelicError(f"Failed to compile Relic: {e}") from e
+        _check_script(module)
+        try:
+            body = (
+                ast.parse(f"{output} = None").body
+                + module.body
+                + ast.parse(f"return {output}").body
+            )
+            func_def = ast.FunctionDef(
+                name="__relic__",
+                args=ast.arguments(
+                    posonlyargs=[], args=[ast.arg(arg=a) for a in inputs], vararg=None,
+                    kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[],
+                ),
+                body=body,
+                decorator_list=[],
+                returns=None,
+                type_params=[],
+            )
+            tree = ast.fix_missing_locations(ast.Module(body=[func_def], type_ignores=[]))
+            namespace = {}
+            exec(compile(tree, "<relic:script>", "exec"), namespace)
+        except Exception as e:
+            raise RelicError(f"Failed to compile Relic: {e}") from e
+        return namespace["__relic__"]
+
+    return _cached(("script", source_hash(source), tuple(inputs), output), build)
+
+def cache_info():
+    with _lock:
+        return {**_stats, "size": len(_cache), "max_size": CACHE_SIZE}
@@ -0,0 +1,37 @@
+"""rfpg (人格行列で歪めた近傍平均への更新) の CSR バッチ実装
+
+sum_j P[i] @ X[j] = P[i] @ (sum_j X[j]) なので、
+近傍和を CSR の疎行列積で一括計算してから人格行列を1回だけ掛ける。
+"""
+import numpy as np
+from scipy.sparse import csr_matrix
+
+def to_csr(G):
+    """隣接リスト G を CSR (indptr, indices) の疎行列に変換する"""
+    N = len(G)
+    indptr = np.zeros(N + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(nb) for nb in G])
+    indices = np.fromiter((j for nb in G for j in nb), dtype=np.int64, count=indptr[-1])
+    data = np.ones(len(indices))
+    return csr_matrix((data, indices, indptr), shape=(N, N))
+
+def stack_personas(P):
+    """人格行列のリストを連続した (N, d, d) テンソルにまとめる"""
+    return np.ascontiguousarray(np.asarray(P, dtype=float))
+
+def normalize_rows(X):
+    n = np.linalg.norm(X, axis=1, keepdims=True)
+    np.divide(X, n, out=X, where=n > 0)
+    return X
+
+def rfpg_rows(X, P_rows, A_rows, X_rows, alpha, out):
+    """A_rows に対応する行だけを out に計算する (シャード実行と共通のカーネル)"""
+    S = A_rows @ X
+    np.matmul(P_rows, S[:, :, None], out=out[:, :, None])
+    out *= (1 - alpha)
+    out += alpha * X_rows
+    return normalize_rows(out)
+
+def rfpg_step_csr(X, P, A, alpha):
+    """1ステップ分を新しい配列に計算する。A は to_csr の出力、P は (N, d, d)"""
+    return rfpg_rows(X, P, A, X, alpha, np.empty_like(X))
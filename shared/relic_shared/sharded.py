@@ -0,0 +1,198 @@
+import multiprocessing as mp
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from .rfpg import rfpg_rows
+
+# ===== sharded runner =====
+# ノード集合を行ブロックに分割し、プロセスプールで rfpg_rows を並列実行する。
+# X (前後2面) / P / CSR 配列は共有メモリに置き、ステップ間は Barrier と
+# バッファの面切り替えだけで同期する (配列の pickle は発生しない)。
+# 各行の計算はシリアル版 rfpg_step_csr と同じカーネル・同じ演算順序なので、
+# 結果はビット単位で一致する。
+#
+# ワーカーが落ちたときに Barrier で永久に待たないよう、
+#   - 親側の wait() には timeout (SHARD_TIMEOUT 秒) を付け、
+#   - 監視スレッドがワーカーの終了を見つけたら Barrier を abort する。
+# どちらの場合も step() は ShardError を送出し、共有メモリは close() で解放される。
+
+SHARD_TIMEOUT = float(os.getenv("SHARD_TIMEOUT", "60"))
+
+class ShardError(RuntimeError):
+    """ワーカーの異常終了・タイムアウトで Barrier が壊れた"""
+
+def _attach(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def _worker(specs, N, d, alpha, lo, hi, barrier, stop):
+    handles = {}
+    arrays = {}
+    for key, (name, shape, dtype) in specs.items():
+        handles[key], arrays[key] = _attach(name, shape, dtype)
+
+    X, P = arrays["X"], arrays["P"]
+    indptr, indices, data = arrays["indptr"], arrays["indices"], arrays["data"]
+    s, e = indptr[lo], indptr[hi]
+    A_rows = csr_matrix((data[s:e], indices[s:e], indptr[lo:hi + 1] - s), shape=(hi - lo, N))
+    P_rows = P[lo:hi]
+
+    front = 0
+    try:
+        while True:
+            barrier.wait()
+            if stop.value:
+                break
+            rfpg_rows(X[front], P_rows, A_rows, X[front, lo:hi], alpha, X[1 - front, lo:hi])
+            barrier.wait()
+            front = 1 - front
+    except threading.BrokenBarrierError:
+        # 親が abort した (他のワーカーの異常終了・タイムアウト・close)
+        pass
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        del X, P, indptr, indices, data, A_rows, P_rows, arrays
+        for shm in handles.values():
+            shm.close()
+
+def partition(A, workers, d):
+    """行あたりのコスト (次数 * d + d^2) が均等になるように行境界を決める"""
+    N = A.shape[0]
+    cost = A.indptr + np.arange(N + 1) * d
+    bounds = np.searchsorted(cost, np.linspace(0, cost[-1], workers + 1))
+    bounds[0], bounds[-1] = 0, N
+    return bounds
+
+class ShardedRunner:
+    """共有メモリ上の X, P をプロセスプールで更新する rfpg ランナー
+
+    step() の戻り値は共有バッファのビューで、次の step() で上書きされる。
+    close() の後も使う場合はコピーしておくこと。共有メモリを確実に解放するため
+    with 文 (または try / finally で close()) の中で使う。
+
+        with ShardedRunner(X, P, A, alpha) as runner:
+            for t in range(T):
+                X = runner.step()
+            X = X.copy()
+    """
+
+    def __init__(self, X, P, A, alpha, workers=None, timeout=SHARD_TIMEOUT):
+        N, d = X.shape
+        self.workers = workers or mp.cpu_count()
+        self.timeout = timeout
+        self._shm = []
+        self._procs = []
+        self._X = None
+        self._dead = []
+        self._closing = threading.Event()
+        try:
+            self._start(X, P, A, alpha, N, d)
+        except BaseException:
+            self.close()
+            raise
+
+    def _start(self, X, P, A, alpha, N, d):
+        specs = {}
+        arrays = {
+            "X": np.stack([X, np.empty_like(X)]).astype(float),
+            "P": np.asarray(P, dtype=float),
+            "indptr": A.indptr.astype(np.int64),
+            "indices": A.indices.astype(np.int64),
+            "data": A.data.astype(float),
+        }
+        for key, arr in arrays.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            self._shm.append(shm)
+            view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+            view[...] = arr
+            specs[key] = (shm.name, arr.shape, arr.dtype)
+            if key == "X":
+                self._X = view
+
+        # スクリプト型のエントリポイントを spawn で再実行しないよう fork を優先する
+        ctx = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else None)
+        self._barrier = ctx.Barrier(self.workers + 1)
+        self._stop = ctx.Value("b", 0)
+        bounds = partition(A, self.workers, d)
+        self._procs = [
+            ctx.Process(
+                target=_worker,
+                args=(specs, N, d, alpha, bounds[w], bounds[w + 1], self._barrier, self._stop),
+                daemon=True,
+            )
+            for w in range(self.workers)
+        ]
+        for p in self._procs:
+            p.start()
+        self._front = 0
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    def _watch(self):
+        """ワーカーが1つでも終了したら Barrier を壊して親の wait() を起こす"""
+        procs = list(self._procs)
+        while not self._closing.wait(0.2):
+            dead = [p.pid for p in procs if p.exitcode is not None]
+            if dead:
+                self._dead = dead
+                self._barrier.abort()
+                return
+
+    @property
+    def X(self):
+        return self._X[self._front]
+
+    def _wait(self):
+        try:
+            self._barrier.wait(self.timeout)
+        except threading.BrokenBarrierError:
+            dead = self._dead or [p.pid for p in self._procs if p.exitcode is not None]
+            reason = f"worker(s) {dead} exited" if dead else f"timed out after {self.timeout}s"
+            self._barrier.abort()
+            raise ShardError(f"sharded step failed: {reason}") from None
+
+    def step(self):
+        self._wait()  # go
+        self._wait()  # 全シャードの書き込み完了
+        self._front = 1 - self._front
+        return self.X
+
+    def close(self):
+        if self._procs:
+            self._closing.set()
+            self._stop.value = 1
+            try:
+                self._barrier.wait(self.timeout)
+            except threading.BrokenBarrierError:
+                pass
+            # 正常終了でも壊れていても、残っている wait() をすべて解放する
+            self._barrier.abort()
+            deadline = time.monotonic() + self.timeout
+            for p in self._procs:
+                p.join(max(0.0, deadline - time.monotonic()))
+                if p.is_alive():
+                    p.terminate()
+                    p.join()
+            self._procs = []
+        self._X = None
+        for shm in self._shm:
+            # 呼び出し側がまだビューを持っていると close() できないが、unlink すれば
+            # 名前は消え、メモリは最後のビューが無くなった時点で解放される
+            try:
+                shm.close()
+            except BufferError:
+                pass
+            shm.unlink()
+        self._shm = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
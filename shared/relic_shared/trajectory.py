@@ -0,0 +1,243 @@
+"""列指向のトラジェクトリ保存形式 (chunked .npy)
+
+(step, node, dim) ごとに1行の long 形式 CSV の代わりに、1ステップ分の (N, d) ブロックを
+列ごとのチャンクファイルに追記する。drift のようなノードごとのスカラーは独立した列 (N,) になる。
+
+    run.traj/
+      meta.json                  {"nodes": [...], "columns": {"belief": [d], "drift": []},
+                                  "dtype": "float64", "chunk_steps": 64, "steps": T}
+      belief/000000.npy ...      (<=chunk_steps, N, d)
+      drift/000000.npy ...       (<=chunk_steps, N)
+
+書き込みは chunk_steps ステップごとに1ファイル + meta.json の更新だけなので、途中で
+止まっても最後に書けたチャンクまでは読める。読み込みは read() で (T, N, d) / (T, N) の
+配列がそのまま返る (pivot 不要)。steps / nodes を指定すると必要なチャンクだけを memmap で開く。
+CSV が必要な場合は to_csv() / コマンドラインで変換する。
+
+    python -m relic_shared.trajectory run.traj out.csv
+
+既存の long 形式 CSV (step, node[_index], dim[_index], value, <スカラー列>...) は load() に
+そのまま渡せる。初回だけ CSV をチャンク単位で読んで (T, N, d) の memmap に詰め、
+隣に <name>.csv.traj/ としてキャッシュする (CSV のサイズ・更新時刻が変わったら作り直す)。
+"""
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+META = "meta.json"
+
+class TrajectoryWriter:
+    """1ステップ分の列をまとめて append() し、chunk_steps ごとにディスクへ書き出す"""
+
+    def __init__(self, path, nodes, columns, dtype="float64", chunk_steps=64):
+        """
+        nodes:   ノードのラベル (CSV 変換時の node 列に使う)
+        columns: 列名 -> 1ノードあたりの形状 (belief なら (d,), drift なら ())
+        """
+        self.path = path
+        self.nodes = [n.item() if isinstance(n, np.generic) else n for n in nodes]
+        self.columns = {name: tuple(int(k) for k in shape) for name, shape in columns.items()}
+        self.dtype = np.dtype(dtype)
+        self.chunk_steps = chunk_steps
+        self.steps = 0
+        self._chunk = 0
+        self._fill = 0
+        n = len(self.nodes)
+        self._buffers = {
+            name: np.empty((chunk_steps, n) + shape, dtype=self.dtype)
+            for name, shape in self.columns.items()
+        }
+        os.makedirs(path, exist_ok=True)
+        for name in self.columns:
+            col_dir = os.path.join(path, name)
+            os.makedirs(col_dir, exist_ok=True)
+            for old in os.listdir(col_dir):
+                if old.endswith(".npy"):
+                    os.remove(os.path.join(col_dir, old))
+        self._write_meta()
+
+    def append(self, **values):
+        """1ステップ分の値を追加する (values[name] は (N,) + shape)"""
+        for name, buf in self._buffers.items():
+            buf[self._fill] = values[name]
+        self._fill += 1
+        self.steps += 1
+        if self._fill == self.chunk_steps:
+            self.flush()
+
+    def flush(self):
+        if self._fill == 0:
+            return
+        for name, buf in self._buffers.items():
+            np.save(os.path.join(self.path, name, f"{self._chunk:06d}.npy"), buf[:self._fill])
+        if self._fill == self.chunk_steps:
+            self._chunk += 1
+            self._fill = 0
+        # 埋まっていないチャンクは次の flush() で同じファイル名に上書きされる
+        self._write_meta()
+
+    def close(self):
+        self.flush()
+
+    def _write_meta(self):
+        meta = {
+            "nodes": self.nodes,
+            "columns": {name: list(shape) for name, shape in self.columns.items()},
+            "dtype": self.dtype.name,
+            "chunk_steps": self.chunk_steps,
+            "steps": self.steps,
+        }
+        tmp = os.path.join(self.path, META + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, META))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_meta(path):
+    with open(os.path.join(path, META)) as f:
+        return json.load(f)
+
+def read(path, columns=None, steps=None, nodes=None, mmap=True):
+    """列名 -> (T, N, ...) の配列を返す。meta.json の steps を超える分 (書きかけ) は含めない
+
+    steps は slice、nodes は slice / index 列。steps に掛からないチャンクは開かず、
+    1チャンクに収まる範囲なら memmap のビューのまま返す (実際の読み込みはアクセス時)。
+    """
+    meta = read_meta(path)
+    # 読むステップ列。負の stride でも [lo, hi) はその最小・最大を覆う範囲
+    r = range(*(steps or slice(None)).indices(meta["steps"]))
+    lo, hi = (min(r[0], r[-1]), max(r[0], r[-1]) + 1) if r else (0, 0)
+    size = meta["chunk_steps"]
+    out = {}
+    for name in columns or meta["columns"]:
+        col_dir = os.path.join(path, name)
+        files = sorted(f for f in os.listdir(col_dir) if f.endswith(".npy"))
+        first, last = lo // size, -(-hi // size)
+        chunks = [
+            np.load(os.path.join(col_dir, f), mmap_mode="r" if mmap else None)
+            for f in files[first:last]
+        ]
+        if len(chunks) == 1:
+            data = chunks[0]
+        elif chunks:
+            data = np.concatenate(chunks)
+        else:
+            shape = (len(meta["nodes"]), *meta["columns"][name])
+            data = np.empty((0, *shape), dtype=meta["dtype"])
+        offset = first * size
+        # 負の stride で先頭まで読む時は stop が -1 になるので None にする (末尾からの位置と解釈させない)
+        stop = r.stop - offset
+        data = data[r.start - offset:stop if stop >= 0 else None:r.step]
+        out[name] = data if nodes is None else data[:, nodes]
+    return out
+
+def _csv_columns(header):
+    """long 形式 CSV の (step, node, dim, value) 列名とスカラー列を返す"""
+    def pick(*candidates):
+        for c in candidates:
+            if c in header:
+                return c
+        raise ValueError(f"CSV has none of the columns {candidates}: {header}")
+    keys = (pick("step"), pick("node_index", "node"), pick("dim_index", "dim"), pick("value"))
+    return keys, [c for c in header if c not in keys]
+
+def _source_stamp(csv_path):
+    st = os.stat(csv_path)
+    return {"file": os.path.basename(csv_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def from_csv(csv_path, cache=None, chunksize=1_000_000):
+    """long 形式 CSV を (T, N, d) の memmap に変換して cache (既定: <csv>.traj) に保存し、そのパスを返す
+
+    キャッシュが同じ CSV (サイズ・更新時刻) から作られていれば何もしない。
+    step / node は昇順 (pivot_table と同じ並び)、欠けている値は NaN になる。
+    """
+    import pandas as pd
+
+    cache = cache or csv_path + ".traj"
+    stamp = _source_stamp(csv_path)
+    try:
+        if read_meta(cache).get("source") == stamp:
+            return cache
+    except (OSError, ValueError):
+        pass
+
+    header = list(pd.read_csv(csv_path, nrows=0).columns)
+    (step_col, node_col, dim_col, value_col), scalars = _csv_columns(header)
+
+    # 1周目: step / node / dim の範囲だけを集める
+    steps, nodes, dim = set(), set(), 0
+    for chunk in pd.read_csv(csv_path, usecols=[step_col, node_col, dim_col], chunksize=chunksize):
+        steps.update(chunk[step_col].unique().tolist())
+        nodes.update(chunk[node_col].unique().tolist())
+        dim = max(dim, int(chunk[dim_col].max()) + 1)
+    steps, nodes = np.array(sorted(steps)), sorted(nodes)
+    node_keys = np.array(nodes, dtype=object)
+
+    # 2周目: memmap に直接書き込む
+    if os.path.exists(os.path.join(cache, META)):
+        os.remove(os.path.join(cache, META))
+    arrays = {}
+    for name, shape in [("belief", (dim,))] + [(s, ()) for s in scalars]:
+        os.makedirs(os.path.join(cache, name), exist_ok=True)
+        arrays[name] = np.lib.format.open_memmap(
+            os.path.join(cache, name, "000000.npy"), mode="w+",
+            dtype=np.float64, shape=(len(steps), len(nodes)) + shape,
+        )
+        arrays[name][...] = np.nan
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        si = np.searchsorted(steps, chunk[step_col].to_numpy())
+        ni = np.searchsorted(node_keys, chunk[node_col].to_numpy().astype(object))
+        arrays["belief"][si, ni, chunk[dim_col].to_numpy()] = chunk[value_col].to_numpy(dtype=np.float64)
+        for s in scalars:
+            arrays[s][si, ni] = chunk[s].to_numpy(dtype=np.float64)
+    for arr in arrays.values():
+        arr.flush()
+    del arrays
+
+    meta = {
+        "nodes": [n.item() if isinstance(n, np.generic) else n for n in nodes],
+        "columns": {"belief": [dim], **{s: [] for s in scalars}},
+        "dtype": "float64",
+        "chunk_steps": max(len(steps), 1),
+        "steps": len(steps),
+        "source": stamp,
+    }
+    # meta.json を最後に書くので、途中で止まったキャッシュは次回作り直される
+    with open(os.path.join(cache, META + ".tmp"), "w") as f:
+        json.dump(meta, f)
+    os.replace(os.path.join(cache, META + ".tmp"), os.path.join(cache, META))
+    return cache
+
+def load(path, columns=None, steps=None, nodes=None):
+    """.traj ディレクトリでも long 形式 CSV でも (T, N, ...) の配列として読む (read() と同じ引数)"""
+    if path.endswith(".csv"):
+        path = from_csv(path)
+    return read(path, columns, steps, nodes)
+
+def to_csv(path, csv_path, vector="belief", header=("step", "node", "dim", "value")):
+    """long 形式 CSV (step, node, dim, value, <スカラー列>...) に変換する"""
+    meta = read_meta(path)
+    data = read(path)
+    scalars = [name for name, shape in meta["columns"].items() if not shape]
+    V = data[vector]
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(list(header) + scalars)
+        for step in range(V.shape[0]):
+            extras = list(zip(*(data[name][step].tolist() for name in scalars))) or [()] * len(meta["nodes"])
+            for node, row, extra in zip(meta["nodes"], V[step].tolist(), extras):
+                writer.writerows([step, node, d, v, *extra] for d, v in enumerate(row))
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit("usage: python -m relic_shared.trajectory <run.traj> <out.csv> [step,node,dim,value]")
+    header = sys.argv[3].split(",") if len(sys.argv) > 3 else ("step", "node", "dim", "value")
+    to_csv(sys.argv[1], sys.argv[2], header=header)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from scipy.sparse import random as sparse_random
+
+from relic_shared.rfpg import rfpg_step_csr
+from relic_shared.sharded import ShardedRunner, ShardError, partition
+
+def make_system(N=40, d=8, density=0.15, seed=0):
+    rng = np.random.default_rng(seed)
+    A = sparse_random(N, N, density=density, format="csr", random_state=seed)
+    A.data[:] = 1.0
+    X = rng.normal(size=(N, d))
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+    P = np.linalg.qr(rng.normal(size=(N, d, d)))[0]
+    return X, P, A
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_sharded_is_bit_identical_to_csr(workers):
+    X, P, A = make_system()
+    ref = X
+    with ShardedRunner(X, P, A, 0.6, workers=workers, timeout=10) as runner:
+        for _ in range(10):
+            ref = rfpg_step_csr(ref, P, A, 0.6)
+            assert np.array_equal(runner.step(), ref)
+
+def test_partition_covers_all_rows():
+    _, _, A = make_system(N=100)
+    bounds = partition(A, 4, 8)
+    assert bounds[0] == 0 and bounds[-1] == 100
+    assert np.all(np.diff(bounds) >= 0)
+
+def test_close_frees_shared_memory():
+    X, P, A = make_system()
+    runner = ShardedRunner(X, P, A, 0.6, workers=2, timeout=10)
+    names = [shm.name for shm in runner._shm]
+    procs = list(runner._procs)
+    runner.step()
+    runner.close()
+    assert not any(p.is_alive() for p in procs)
+    from multiprocessing import shared_memory
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+def test_dead_worker_raises_shard_error():
+    X, P, A = make_system()
+    with ShardedRunner(X, P, A, 0.6, workers=2, timeout=10) as runner:
+        runner.step()
+        runner._procs[0].kill()
+        runner._procs[0].join()
+        with pytest.raises(ShardError):
+            runner.step()
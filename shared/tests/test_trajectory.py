@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pytest
+
+from relic_shared import trajectory
+from relic_shared.trajectory import TrajectoryWriter
+
+def write(path, T=10, N=3, d=2, chunk_steps=4, seed=0):
+    rng = np.random.default_rng(seed)
+    B, D = rng.normal(size=(T, N, d)), rng.normal(size=(T, N))
+    with TrajectoryWriter(path, nodes=[f"n{i}" for i in range(N)],
+                          columns={"belief": (d,), "drift": ()}, chunk_steps=chunk_steps) as w:
+        for t in range(T):
+            w.append(belief=B[t], drift=D[t])
+    return B, D
+
+def test_round_trip_across_chunks(tmp_path):
+    path = str(tmp_path / "run.traj")
+    B, D = write(path, T=10, chunk_steps=4)
+    data = trajectory.read(path)
+    assert np.array_equal(data["belief"], B)
+    assert np.array_equal(data["drift"], D)
+    assert sorted(os.listdir(os.path.join(path, "belief"))) == ["000000.npy", "000001.npy", "000002.npy"]
+    meta = trajectory.read_meta(path)
+    assert meta["steps"] == 10 and meta["nodes"] == ["n0", "n1", "n2"]
+
+def test_partial_chunk_is_readable_before_close(tmp_path):
+    path = str(tmp_path / "run.traj")
+    w = TrajectoryWriter(path, nodes=[0, 1], columns={"belief": (2,)}, chunk_steps=4)
+    for t in range(6):
+        w.append(belief=np.full((2, 2), t))
+    # 4ステップ分のチャンクだけがディスクにある
+    assert trajectory.read(path)["belief"][:, 0, 0].tolist() == [0, 1, 2, 3]
+    w.flush()
+    assert trajectory.read(path)["belief"][:, 0, 0].tolist() == [0, 1, 2, 3, 4, 5]
+    w.append(belief=np.full((2, 2), 6))
+    w.close()
+    assert trajectory.read(path)["belief"][:, 0, 0].tolist() == [0, 1, 2, 3, 4, 5, 6]
+
+def test_csv_round_trip(tmp_path):
+    path = str(tmp_path / "run.traj")
+    B, D = write(path, T=5, N=2, d=3)
+    csv_path = str(tmp_path / "run.csv")
+    trajectory.to_csv(path, csv_path)
+    data = trajectory.load(csv_path)
+    np.testing.assert_allclose(data["belief"], B)
+    np.testing.assert_allclose(data["drift"], D)
+    # 2回目はキャッシュ (<csv>.traj) をそのまま使う
+    stamp = os.stat(os.path.join(csv_path + ".traj", "meta.json")).st_mtime_ns
+    trajectory.load(csv_path)
+    assert os.stat(os.path.join(csv_path + ".traj", "meta.json")).st_mtime_ns == stamp
+
+STEP_SLICES = [
+    slice(None), slice(2, 9), slice(3, 4), slice(None, None, 3), slice(-3, None),
+    slice(None, None, -1), slice(8, 1, -2), slice(-1, -4, -1), slice(5, None, -1),
+    slice(None, 2, -1), slice(3, 3), slice(7, 2), slice(100, None, -3), slice(-100, 100, 4),
+]
+
+@pytest.mark.parametrize("steps", STEP_SLICES, ids=str)
+@pytest.mark.parametrize("mmap", [True, False])
+def test_read_matches_numpy_slicing(tmp_path, steps, mmap):
+    path = str(tmp_path / "run.traj")
+    B, D = write(path, T=11, chunk_steps=4)
+    data = trajectory.read(path, steps=steps, mmap=mmap)
+    assert np.array_equal(data["belief"], B[steps])
+    assert np.array_equal(data["drift"], D[steps])
+
+def test_read_nodes_and_columns(tmp_path):
+    path = str(tmp_path / "run.traj")
+    B, _ = write(path, T=9, N=4, chunk_steps=4)
+    data = trajectory.read(path, columns=["belief"], steps=slice(None, None, -2), nodes=[3, 0])
+    assert list(data) == ["belief"]
+    assert np.array_equal(data["belief"], B[::-2][:, [3, 0]])